@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+
+import aiohttp
+import yaml
+
+from . import load, seed
+
+DEFAULT_MIX = pathlib.Path(__file__).parent / 'mix.yaml'
+
+def compare(result, baseline, limits):
+    regressions = []
+    for route, stats in result['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+        if stats['p99_ms'] > before['p99_ms'] * (1 + limits['p99']):
+            regressions.append('{:s}: p99 {:.2f}ms -> {:.2f}ms'.format(route, before['p99_ms'], stats['p99_ms']))
+        if stats['rps'] < before['rps'] * (1 - limits['rps']):
+            regressions.append('{:s}: rps {:.1f} -> {:.1f}'.format(route, before['rps'], stats['rps']))
+    return regressions
+
+def print_report(result):
+    print('{:<16s} {:>9s} {:>7s} {:>9s} {:>9s} {:>9s} {:>9s}'.format('route', 'requests', 'errors', 'rps', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for route, stats in result['routes'].items():
+        print('{:<16s} {:>9d} {:>7d} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f}'.format(route, stats['requests'], stats['errors'], stats['rps'], 
+                                                                             stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+    print('total: {:d} requests, {:.1f} rps'.format(result['requests'], result['rps']))
+
+async def bench(config):
+    connector = aiohttp.TCPConnector(limit = config['concurrency'])
+    async with aiohttp.ClientSession(config['url'], connector = connector) as session:
+        data = await seed.seed(session, config['seed'])
+        print('seeded {:d} users, {:d} forums, {:d} threads, {:d} posts'.format(len(data.users), len(data.forums), 
+                                                                             len(data.threads), len(data.posts)))
+        if config.get('warmup'):
+            await load.run(session, data, config['mix'], config['concurrency'], config['warmup'])
+        return await load.run(session, data, config['mix'], config['concurrency'], config['duration'])
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m bench', description = 'seed the forum api and replay a traffic mix against it')
+    parser.add_argument('--config', default = DEFAULT_MIX, help = 'mix and dataset description')
+    parser.add_argument('--url', help = 'base url of a running server')
+    parser.add_argument('--concurrency', type = int)
+    parser.add_argument('--duration', type = float)
+    parser.add_argument('--output', help = 'write results as json to this file')
+    parser.add_argument('--baseline', help = 'results json of a previous run to compare against')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    for name in ('url', 'concurrency', 'duration'):
+        if getattr(args, name) is not None:
+            config[name] = getattr(args, name)
+
+    result = asyncio.run(bench(config))
+    result['config'] = {name: config[name] for name in ('url', 'concurrency', 'duration', 'seed', 'mix')}
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, config['regression'])
+        for line in regressions:
+            print('regression:', line)
+        if regressions:
+            sys.exit(1)
+
+main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import sys
+
+import asyncpg
+
+from src.db import DSN
+from src.queries import STATEMENTS
+from src.settings import config
+
+from .seed import token
+
+async def make_thread(conn):
+    nick = 'u' + token()
+    slug = 'f' + token()
+    await conn.execute("insert into users values ($1, $2, $3, $4);", nick, 'Check ' + nick, nick + '@check.local', '')
+    await conn.execute("insert into forums values ($1, $2, $3, 0, 0);", slug, 'Check ' + slug, nick)
+    thread = await conn.fetchval("insert into threads (title, author, forum, message, slug, created, votes) " + 
+                                 "values ('check', $1, $2, 'check', $3, now(), 0) returning id;", nick, slug, 't' + token())
+    return nick, slug, thread
+
+async def vote_sequence(conn):
+    nick, _, thread = await make_thread(conn)
+    for voice in (1, -1, -1):
+        row = await conn.fetchrow(STATEMENTS[('vote', 'id')], thread, nick, voice)
+    return row['votes']
+
+async def vote_batch_sequence(conn):
+    nick, _, thread = await make_thread(conn)
+    for voice in (1, -1, -1):
+        row = await conn.fetchrow(STATEMENTS[('vote_batch', 'id')], thread, [nick], [voice])
+    return row['votes']
+
+async def drop_thread(conn, nick, slug):
+    await conn.execute("delete from users where nickname = $1;", nick)
+    await conn.execute("delete from forum_deltas where forum = $1;", slug)
+    await conn.execute("delete from forum_users where forum = $1;", slug)
+    await conn.execute("update stats set total = total - 1 where entity in ('user', 'forum', 'thread') and shard = pg_backend_pid() % 16;")
+
+async def waiting_on_lock(conn, pid):
+    while not await conn.fetchval("select wait_event_type = 'Lock' from pg_stat_activity where pid = $1;", pid):
+        await asyncio.sleep(0.01)
+
+async def first_votes_race(conn, other, statement, args):
+    # both sessions take their snapshot before either vote row exists,
+    # the second one waits on the unique index and then updates the first one's row
+    nick, slug, thread = await make_thread(conn)
+    try:
+        first = conn.transaction()
+        await first.start()
+        await conn.fetchrow(statement, thread, *args(nick))
+        second = other.transaction()
+        await second.start()
+        racing = asyncio.ensure_future(other.fetchrow(statement, thread, *args(nick)))
+        await waiting_on_lock(conn, other.get_server_pid())
+        await first.commit()
+        await racing
+        await second.commit()
+        return await conn.fetchval("select votes from threads where id = $1;", thread)
+    finally:
+        await drop_thread(conn, nick, slug)
+
+async def vote_race(conn, other):
+    return await first_votes_race(conn, other, STATEMENTS[('vote', 'id')], lambda nick: (nick, 1))
+
+async def vote_batch_race(conn, other):
+    return await first_votes_race(conn, other, STATEMENTS[('vote_batch', 'id')], lambda nick: ([nick], [1]))
+
+CHECKS = [
+    ('vote +1, -1, -1 leaves votes at -1', vote_sequence, -1),
+    ('batched vote +1, -1, -1 leaves votes at -1', vote_batch_sequence, -1),
+]
+
+# these commit their fixture rows and delete them afterwards
+CONCURRENT_CHECKS = [
+    ('concurrent first votes +1, +1 by one author leave votes at 1', vote_race, 1),
+    ('concurrent batched first votes +1, +1 by one author leave votes at 1', vote_batch_race, 1),
+]
+
+def report(name, result, expected):
+    ok = result == expected
+    print('{:s} {:s}{:s}'.format('ok  ' if ok else 'FAIL', name, '' if ok else ' (got {})'.format(result)))
+    return not ok
+
+async def connect():
+    conn = await asyncpg.connect(DSN.format(**config['postgres']))
+    await conn.set_builtin_type_codec('citext', codec_name = 'text')
+    return conn
+
+async def run():
+    conn = await connect()
+    other = await connect()
+    failed = 0
+    try:
+        for name, check, expected in CHECKS:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                result = await check(conn)
+            finally:
+                await transaction.rollback()
+            failed += report(name, result, expected)
+        for name, check, expected in CONCURRENT_CHECKS:
+            failed += report(name, await check(conn, other), expected)
+    finally:
+        await other.close()
+        await conn.close()
+    return failed
+
+def main():
+    if asyncio.run(run()):
+        sys.exit(1)
+
+main()
\ No newline at end of file
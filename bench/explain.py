@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import sys
+import uuid
+from datetime import datetime
+
+import aiohttp
+import asyncpg
+import yaml
+
+from src import migrations
+from src.counters import FLUSH_QUERY
+from src.db import DSN
+from src.queries import SIGNUP, SIGNUP_CONFLICTS, STATEMENTS
+from src.reset import CHANNEL, EMPTY_QUERY, NOTIFY_QUERY, RESET_STATS_QUERY
+from src.settings import config
+
+from . import seed
+
+DEFAULT_MIX = pathlib.Path(__file__).parent / 'mix.yaml'
+
+SAMPLE_QUERY = "with t as (select thread, count(*) from posts group by thread order by count(*) desc limit 1) " + \
+    "select th.id, th.slug, th.forum, th.created, p.id as post, p.created as post_created, p.author, p.path, path_root(p.path) as root " + \
+    "from t join threads th on th.id = t.thread join posts p on p.thread = t.thread " + \
+    "order by p.id offset (select count / 2 from t) limit 1;"
+
+INDEXES_QUERY = "select i.relname as name, c.relname as table, am.amname as method, x.indisunique as unique, " + \
+    "array(select pg_get_indexdef(x.indexrelid, k, true) from generate_series(1, x.indnkeyatts) k) as columns, " + \
+    "pg_relation_size(x.indexrelid) as bytes " + \
+    "from pg_index x join pg_class i on i.oid = x.indexrelid join pg_class c on c.oid = x.indrelid " + \
+    "join pg_am am on am.oid = i.relam join pg_namespace n on n.oid = c.relnamespace " + \
+    "where n.nspname = 'public' order by c.relname, i.relname;"
+
+UPDATE_POST_QUERY = "update posts set message = $1, edit = true where id = $2;"
+
+def key_name(key):
+    if isinstance(key, str):
+        return key
+    return ':'.join(str(part) if not isinstance(part, tuple) else ','.join(part) for part in key)
+
+def statement_args(key, s):
+    ident = {'id': s['id'], 'slug': s['slug']}
+    if isinstance(key, str):
+        return {
+            'forum': [s['forum']],
+            'create_forum': [s['new'], 'explain', s['author']],
+            'create_thread': [s['author'], s['forum'], 'explain', 'explain', s['new'], s['created']],
+            'create_posts': [s['id'], None, [s['post']], [s['author']], ['explain'], s['created']],
+            'status': [],
+            'profile': [s['author']],
+        }[key]
+
+    kind = key[0]
+    if kind == 'forum_threads':
+        return [s['forum']] + ([s['created']] if key[2] else []) + [100]
+    if kind == 'forum_users':
+        return [s['forum']] + ([s['author'].lower()] if key[2] else []) + [100]
+    if kind == 'thread_posts':
+        sort, seek = key[2], key[4]
+        if seek == 'since':
+            return [ident[key[1]], s['post'], 100]
+        if seek == 'cursor':
+            return [ident[key[1]]] + {'flat': [s['post_created'], s['post']], 'tree': [s['path']], 'parent_tree': [s['root']]}[sort] + [100]
+        return [ident[key[1]], 100]
+    if kind == 'update_profile':
+        return [s['profile'][field] for field in key[1]] + [s['author']]
+    if kind == 'thread':
+        return [ident[key[1]]]
+    if kind == 'update_thread':
+        return ['explain' for _ in key[2]] + [ident[key[1]]]
+    if kind == 'vote':
+        return [ident[key[1]], s['author'], 1]
+    if kind == 'vote_batch':
+        return [ident[key[1]], [s['author']], [1]]
+    if kind == 'post':
+        return [s['post']]
+    raise KeyError(key)
+
+# truncate and notify, the rest of reset.RESET_QUERY, cannot be explained
+def usecase_queries(s):
+    return {
+        'signup': (SIGNUP, [s['new'], 'explain', s['new'] + '@explain.local', 'explain']),
+        'signup_conflicts': (SIGNUP_CONFLICTS, [s['author'], s['profile']['email']]),
+        'update_post': (UPDATE_POST_QUERY, ['explain', s['post']]),
+        'flush_counters': (FLUSH_QUERY, []),
+        'reset_empty': (EMPTY_QUERY, []),
+        'reset_stats': (RESET_STATS_QUERY, []),
+        'reset_notify': (NOTIFY_QUERY, [CHANNEL, ['explain']]),
+    }
+
+def walk(plan, nodes, indexes):
+    label = plan['Node Type']
+    if 'Index Name' in plan:
+        indexes.add(plan['Index Name'])
+        label += '(' + plan['Index Name'] + ')'
+    elif 'Relation Name' in plan:
+        label += '(' + plan['Relation Name'] + ')'
+    nodes.append(label)
+    for child in plan.get('Plans', []):
+        walk(child, nodes, indexes)
+
+async def explain(conn, query, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            result = json.loads(await conn.fetchval('explain (analyze, buffers, format json) ' + query, *args))[0]
+        finally:
+            await transaction.rollback()
+        timings.append(result['Execution Time'])
+
+    plan = result['Plan']
+    nodes = []
+    indexes = set()
+    walk(plan, nodes, indexes)
+    return {
+        'execution_ms': statistics.median(timings),
+        'planning_ms': result['Planning Time'],
+        'shared_hit': plan.get('Shared Hit Blocks', 0),
+        'shared_read': plan.get('Shared Read Blocks', 0),
+        'triggers_ms': sum(trigger['Time'] for trigger in result.get('Triggers', [])),
+        'plan': nodes,
+        'indexes': sorted(indexes),
+    }
+
+def covers(index, other):
+    if index['table'] != other['table'] or index['name'] == other['name'] or other['method'] != 'btree':
+        return False
+    if index['method'] == 'hash':
+        return other['columns'][0] == index['columns'][0]
+    if index['method'] != 'btree' or other['columns'][:len(index['columns'])] != index['columns']:
+        return False
+    return len(other['columns']) > len(index['columns']) or other['unique'] or index['name'] > other['name']
+
+def audit(indexes, statements):
+    used = set()
+    for result in statements.values():
+        used.update(result['indexes'])
+
+    unused = []
+    redundant = []
+    for index in indexes:
+        if index['unique']:
+            continue
+        if index['name'] not in used:
+            unused.append(index['name'])
+        cover = next((other['name'] for other in indexes if covers(index, other)), None)
+        if cover is not None:
+            redundant.append({'index': index['name'], 'covered_by': cover})
+    return unused, redundant
+
+def compare(report, baseline, limits):
+    regressions = []
+    for name, result in report['statements'].items():
+        before = baseline['statements'].get(name)
+        if before is None:
+            continue
+        if result['plan'] != before['plan']:
+            regressions.append('{:s}: plan changed {} -> {}'.format(name, before['plan'], result['plan']))
+        if result['execution_ms'] > before['execution_ms'] * (1 + limits['time']) and \
+                result['execution_ms'] - before['execution_ms'] > limits['min_ms']:
+            regressions.append('{:s}: {:.3f}ms -> {:.3f}ms'.format(name, before['execution_ms'], result['execution_ms']))
+        buffers, before_buffers = result['shared_hit'] + result['shared_read'], before['shared_hit'] + before['shared_read']
+        if buffers > before_buffers * (1 + limits['buffers']):
+            regressions.append('{:s}: {:d} -> {:d} buffers'.format(name, before_buffers, buffers))
+    return regressions
+
+async def seed_api(url, mix):
+    with open(mix) as f:
+        dataset = yaml.safe_load(f)['seed']
+    async with aiohttp.ClientSession(url) as session:
+        await seed.seed(session, dataset)
+
+async def sample(conn):
+    row = await conn.fetchrow(SAMPLE_QUERY)
+    if row is None:
+        raise RuntimeError('database has no posts, seed it first (--url)')
+    s = dict(row)
+    s['profile'] = dict(await conn.fetchrow("select fullname, email, about from users where nickname = $1;", s['author']))
+    s['new'] = 'explain-' + uuid.uuid4().hex[:12]
+    return s
+
+async def run(args):
+    if args.url:
+        await seed_api(args.url, args.mix)
+
+    conn = await asyncpg.connect(DSN.format(**config['postgres']))
+    try:
+        await conn.set_builtin_type_codec('citext', codec_name = 'text')
+        await conn.execute('analyze;')
+        if args.generic:
+            await conn.execute('set plan_cache_mode = force_generic_plan;')
+
+        s = await sample(conn)
+        queries = {key_name(key): (query, statement_args(key, s)) for key, query in STATEMENTS.items()}
+        queries.update(usecase_queries(s))
+
+        statements = {}
+        for name, (query, query_args) in sorted(queries.items()):
+            statements[name] = await explain(conn, query, query_args, args.repeat)
+
+        indexes = [dict(row) for row in await conn.fetch(INDEXES_QUERY)]
+        unused, redundant = audit(indexes, statements)
+        return {
+            'schema_version': await migrations.version(conn),
+            'created': datetime.now().isoformat(),
+            'statements': statements,
+            'indexes': indexes,
+            'unused': unused,
+            'redundant': redundant,
+        }
+    finally:
+        await conn.close()
+
+def print_report(report):
+    print('schema version {:d}'.format(report['schema_version']))
+    print('{:<44s} {:>10s} {:>9s} {:>9s}  {:s}'.format('statement', 'exec ms', 'hit', 'read', 'indexes'))
+    for name, result in report['statements'].items():
+        print('{:<44s} {:>10.3f} {:>9d} {:>9d}  {:s}'.format(name, result['execution_ms'], result['shared_hit'],
+                                                           result['shared_read'], ', '.join(result['indexes'])))
+    sizes = {index['name']: index['bytes'] for index in report['indexes']}
+    for name in report['unused']:
+        print('unused index: {:s} ({:d} bytes)'.format(name, sizes[name]))
+    for item in report['redundant']:
+        print('redundant index: {:s} (covered by {:s})'.format(item['index'], item['covered_by']))
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m bench.explain',
+                                     description = 'explain every statement the usecases issue and audit the index set')
+    parser.add_argument('--url', help = 'seed the database through a running server first')
+    parser.add_argument('--mix', default = DEFAULT_MIX, help = 'file with the seed dataset description')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'runs per statement, the median time is reported')
+    parser.add_argument('--generic', action = 'store_true', help = 'force generic plans like long-lived prepared statements get')
+    parser.add_argument('--output', help = 'write the report as json to this file')
+    parser.add_argument('--baseline', help = 'report of a previous schema version to compare against')
+    parser.add_argument('--time-limit', type = float, default = 0.5, help = 'allowed relative execution time growth')
+    parser.add_argument('--buffers-limit', type = float, default = 0.2, help = 'allowed relative buffer count growth')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2, default = str)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, {'time': args.time_limit, 'buffers': args.buffers_limit, 'min_ms': 0.1})
+        for line in regressions:
+            print('regression:', line)
+        if regressions:
+            sys.exit(1)
+
+main()
\ No newline at end of file
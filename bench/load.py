@@ -0,0 +1,170 @@
+import asyncio
+import json
+import random
+import time
+
+from . import seed
+
+def thread_ident(thread):
+    return str(thread['id']) if random.random() < 0.5 else thread['slug']
+
+def list_params():
+    return {'limit': random.choice((10, 50, 100)), 'desc': random.choice(('true', 'false'))}
+
+def op_signup(data):
+    nick = 'u' + seed.token()
+    data.users.append(nick)
+    return 'POST', '/api/user/{:s}/create'.format(nick), None, {
+        'fullname': 'User ' + nick, 'email': nick + '@bench.local', 'about': 'created under load'}
+
+def op_personal(data):
+    return 'GET', '/api/user/{:s}/profile'.format(random.choice(data.users)), None, None
+
+def op_personal_edit(data):
+    return 'POST', '/api/user/{:s}/profile'.format(random.choice(data.users)), None, {'about': 'edited ' + seed.token()}
+
+def op_new_forum(data):
+    slug = 'f' + seed.token()
+    data.forums.append(slug)
+    return 'POST', '/api/forum/create', None, {'slug': slug, 'title': 'Forum ' + slug, 'user': random.choice(data.users)}
+
+def op_forum_details(data):
+    return 'GET', '/api/forum/{:s}/details'.format(random.choice(data.forums)), None, None
+
+def op_new_thread(data):
+    slug = 't' + seed.token()
+    return 'POST', '/api/forum/{:s}/create'.format(random.choice(data.forums)), None, {
+        'slug': slug, 'title': 'Thread ' + slug, 'author': random.choice(data.users), 'message': 'created under load'}
+
+def op_new_post(data):
+    thread = data.thread()
+    existing = data.thread_posts.get(thread['id'], [])
+    posts = []
+    for _ in range(random.choice((1, 5, 20))):
+        post = {'author': random.choice(data.users), 'message': 'load post'}
+        if existing and random.random() < 0.8:
+            post['parent'] = random.choice(existing)
+        posts.append(post)
+    return 'POST', '/api/thread/{:s}/create'.format(thread_ident(thread)), None, posts
+
+def op_thread_details(data):
+    return 'GET', '/api/thread/{:s}/details'.format(thread_ident(data.thread())), None, None
+
+def op_forum_threads(data):
+    return 'GET', '/api/forum/{:s}/threads'.format(random.choice(data.forums)), list_params(), None
+
+def op_clear(data):
+    return 'POST', '/api/service/clear', None, None
+
+def op_status(data):
+    return 'GET', '/api/service/status', None, None
+
+def op_new_vote(data):
+    return 'POST', '/api/thread/{:s}/vote'.format(thread_ident(data.thread())), None, {
+        'nickname': random.choice(data.users), 'voice': random.choice((-1, 1))}
+
+def op_thread_update(data):
+    return 'POST', '/api/thread/{:s}/details'.format(thread_ident(data.thread())), None, {'message': 'edited ' + seed.token()}
+
+def op_thread_posts(data):
+    params = list_params()
+    params['sort'] = random.choice(('flat', 'tree', 'parent_tree'))
+    return 'GET', '/api/thread/{:s}/posts'.format(thread_ident(data.thread())), params, None
+
+def op_forum_users(data):
+    return 'GET', '/api/forum/{:s}/users'.format(random.choice(data.forums)), list_params(), None
+
+def op_update_post(data):
+    return 'POST', '/api/post/{:d}/details'.format(data.post()), None, {'message': 'edited ' + seed.token()}
+
+def op_post_details(data):
+    params = {'related': random.choice(('', 'user', 'forum,thread', 'forum,thread,user'))}
+    return 'GET', '/api/post/{:d}/details'.format(data.post()), params, None
+
+OPERATIONS = {
+    'signup': op_signup,
+    'personal': op_personal,
+    'personal_edit': op_personal_edit,
+    'new_forum': op_new_forum,
+    'forum_details': op_forum_details,
+    'new_thread': op_new_thread,
+    'new_post': op_new_post,
+    'thread_details': op_thread_details,
+    'forum_threads': op_forum_threads,
+    'clear': op_clear,
+    'status': op_status,
+    'new_vote': op_new_vote,
+    'thread_update': op_thread_update,
+    'thread_posts': op_thread_posts,
+    'forum_users': op_forum_users,
+    'update_post': op_update_post,
+    'post_details': op_post_details,
+}
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, elapsed, status):
+        self.latencies.setdefault(route, []).append(elapsed)
+        if status >= 500:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, duration):
+        routes = {}
+        total = 0
+        for route, values in sorted(self.latencies.items()):
+            total += len(values)
+            routes[route] = {
+                'requests': len(values),
+                'errors': self.errors.get(route, 0),
+                'rps': len(values) / duration,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+        return {'duration': duration, 'requests': total, 'rps': total / duration, 'routes': routes}
+
+def track(data, route, payload):
+    if route == 'new_thread':
+        thread = json.loads(payload)
+        data.threads.append({'id': thread['id'], 'slug': thread['slug'], 'forum': thread['forum']})
+        data.thread_posts[thread['id']] = []
+    elif route == 'new_post':
+        posts = json.loads(payload)
+        for post in posts:
+            data.thread_posts.setdefault(post['thread'], []).append(post['id'])
+            data.posts.append(post['id'])
+
+async def worker(session, data, mix, deadline, recorder):
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    while time.monotonic() < deadline:
+        route = random.choices(routes, weights)[0]
+        method, path, params, body = OPERATIONS[route](data)
+        started = time.perf_counter()
+        async with session.request(method, path, params = params, json = body) as response:
+            payload = await response.read()
+        recorder.record(route, time.perf_counter() - started, response.status)
+        if response.status == 201:
+            track(data, route, payload)
+
+async def run(session, data, mix, concurrency, duration):
+    mix = {route: weight for route, weight in mix.items() if weight > 0}
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError('unknown routes in mix: ' + ', '.join(sorted(unknown)))
+
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*[worker(session, data, mix, deadline, recorder) for _ in range(concurrency)])
+    return recorder.report(time.monotonic() - started)
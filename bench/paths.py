@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import asyncpg
+
+from src.db import DSN
+from src.settings import config
+
+SCHEMAS = {
+    'array': {
+        'type': 'bigint[]',
+        'append': 'array_append(NEW.path, NEW.id)',
+        'indexes': ['(path, thread)', '(thread, path)', '(id, path)', 'using gin (path)'],
+        'encode': lambda path: list(path),
+    },
+    'bytea': {
+        'type': 'bytea',
+        'append': "coalesce(NEW.path, ''::bytea) || int8send(NEW.id)",
+        'indexes': ['(thread, path)'],
+        'encode': lambda path: b''.join(id.to_bytes(8, 'big') for id in path),
+    },
+}
+
+def make_tree(count, threads, depth):
+    posts = []
+    paths = {}
+    per_thread = {thread: [] for thread in range(1, threads + 1)}
+    for id in range(1, count + 1):
+        thread = random.randint(1, threads)
+        existing = per_thread[thread]
+        parent = random.choice(existing[-depth:]) if existing and random.random() < 0.8 else 0
+        parent_path = paths[parent] if parent else ()
+        paths[id] = parent_path + (id,)
+        posts.append((id, thread, parent, parent_path))
+        existing.append(id)
+    return posts, paths
+
+async def create_schema(conn, name, schema):
+    await conn.execute('drop schema if exists bench_{0:s} cascade; create schema bench_{0:s};'.format(name))
+    await conn.execute('create unlogged table bench_{:s}.posts (id bigint primary key, thread int not null, parent bigint not null, path {:s});'.
+                       format(name, schema['type']))
+    await conn.execute('''create function bench_{0:s}.posts_path() returns trigger as $$
+        begin NEW.path = {1:s}; return NEW; end; $$ language plpgsql;
+        create trigger new_post_path before insert on bench_{0:s}.posts for each row execute function bench_{0:s}.posts_path();'''.
+                       format(name, schema['append']))
+    for i, index in enumerate(schema['indexes']):
+        await conn.execute('create index posts_{:d} on bench_{:s}.posts {:s};'.format(i, name, index))
+
+async def insert(conn, name, schema, posts, batch):
+    query = 'insert into bench_{:s}.posts values ($1, $2, $3, $4);'.format(name)
+    started = time.perf_counter()
+    for i in range(0, len(posts), batch):
+        rows = [(id, thread, parent, schema['encode'](path) if path else None) for id, thread, parent, path in posts[i:i + batch]]
+        await conn.executemany(query, rows)
+    return time.perf_counter() - started
+
+async def tree_reads(conn, name, schema, posts, paths, limit, repeat):
+    query = 'select id from bench_{:s}.posts where thread = $1 and path > $2 order by path limit $3;'.format(name)
+    first = 'select id from bench_{:s}.posts where thread = $1 order by path limit $2;'.format(name)
+    samples = random.sample(posts, min(repeat, len(posts)))
+    started = time.perf_counter()
+    for id, thread, _, _ in samples:
+        await conn.fetch(first, thread, limit)
+    first_page = (time.perf_counter() - started) / len(samples)
+
+    started = time.perf_counter()
+    for id, thread, _, _ in samples:
+        await conn.fetch(query, thread, schema['encode'](paths[id]), limit)
+    deep_page = (time.perf_counter() - started) / len(samples)
+    return first_page, deep_page
+
+async def bench(args):
+    random.seed(args.seed)
+    posts, paths = make_tree(args.posts, args.threads, args.depth)
+    conn = await asyncpg.connect(DSN.format(**config['postgres']))
+    results = {}
+    try:
+        for name, schema in SCHEMAS.items():
+            await create_schema(conn, name, schema)
+            elapsed = await insert(conn, name, schema, posts, args.batch)
+            await conn.execute('analyze bench_{:s}.posts;'.format(name))
+            first_page, deep_page = await tree_reads(conn, name, schema, posts, paths, args.limit, args.repeat)
+            size = await conn.fetchval("select pg_indexes_size('bench_{:s}.posts');".format(name))
+            results[name] = {
+                'insert_seconds': elapsed,
+                'inserts_per_second': len(posts) / elapsed,
+                'first_page_ms': first_page * 1000,
+                'deep_page_ms': deep_page * 1000,
+                'index_bytes': size,
+            }
+            if not args.keep:
+                await conn.execute('drop schema bench_{:s} cascade;'.format(name))
+    finally:
+        await conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m bench.paths', description = 'compare bigint[] and bytea post path encodings')
+    parser.add_argument('--posts', type = int, default = 200000)
+    parser.add_argument('--threads', type = int, default = 20)
+    parser.add_argument('--depth', type = int, default = 10)
+    parser.add_argument('--batch', type = int, default = 1000)
+    parser.add_argument('--limit', type = int, default = 100)
+    parser.add_argument('--repeat', type = int, default = 500)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--keep', action = 'store_true', help = 'keep the bench schemas for inspection')
+    parser.add_argument('--output', help = 'write results as json to this file')
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    print(json.dumps(results, indent = 2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent = 2)
+
+main()
\ No newline at end of file
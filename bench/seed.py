@@ -0,0 +1,84 @@
+import random
+import uuid
+
+class Dataset:
+    def __init__(self):
+        self.users = []
+        self.forums = []
+        self.threads = []
+        self.posts = []
+        self.thread_posts = {}
+
+    def thread(self):
+        return random.choice(self.threads)
+
+    def post(self):
+        return random.choice(self.posts)
+
+def token():
+    return uuid.uuid4().hex[:12]
+
+async def post_json(session, path, data):
+    async with session.post(path, json = data) as response:
+        body = await response.json()
+        if response.status >= 400 and response.status != 409:
+            raise RuntimeError('{:s} -> {:d}: {}'.format(path, response.status, body))
+        return body
+
+async def create_user(session, data):
+    nick = 'u' + token()
+    await post_json(session, '/api/user/{:s}/create'.format(nick), {
+        'fullname': 'User ' + nick, 'email': nick + '@bench.local', 'about': 'seeded by bench'})
+    data.users.append(nick)
+    return nick
+
+async def create_forum(session, data):
+    slug = 'f' + token()
+    await post_json(session, '/api/forum/create', {'slug': slug, 'title': 'Forum ' + slug, 'user': random.choice(data.users)})
+    data.forums.append(slug)
+    return slug
+
+async def create_thread(session, data, forum):
+    slug = 't' + token()
+    thread = await post_json(session, '/api/forum/{:s}/create'.format(forum), {
+        'slug': slug, 'title': 'Thread ' + slug, 'author': random.choice(data.users), 'message': 'seeded thread'})
+    data.threads.append({'id': thread['id'], 'slug': slug, 'forum': forum})
+    data.thread_posts[thread['id']] = []
+    return thread
+
+async def create_posts(session, data, thread, count, depth):
+    batch = []
+    existing = data.thread_posts[thread['id']]
+    for _ in range(count):
+        post = {'author': random.choice(data.users), 'message': 'seeded post ' + token()}
+        if existing and random.random() < 0.8:
+            post['parent'] = random.choice(existing[-depth:])
+        batch.append(post)
+    posts = await post_json(session, '/api/thread/{:d}/create'.format(thread['id']), batch)
+    ids = [post['id'] for post in posts]
+    existing.extend(ids)
+    data.posts.extend(ids)
+    return ids
+
+async def vote(session, data, thread):
+    await post_json(session, '/api/thread/{:d}/vote'.format(thread['id']), {
+        'nickname': random.choice(data.users), 'voice': random.choice((-1, 1))})
+
+async def seed(session, config):
+    data = Dataset()
+    async with session.post('/api/service/clear') as response:
+        await response.read()
+
+    for _ in range(config['users']):
+        await create_user(session, data)
+    for _ in range(config['forums']):
+        await create_forum(session, data)
+    for forum in data.forums:
+        for _ in range(config['threads_per_forum']):
+            await create_thread(session, data, forum)
+    for thread in data.threads:
+        for _ in range(config['post_batches_per_thread']):
+            await create_posts(session, data, thread, config['posts_per_batch'], config['tree_depth'])
+    for _ in range(config['votes']):
+        await vote(session, data, data.thread())
+    return data
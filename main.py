@@ -1,16 +1,31 @@
 from aiohttp import web
 
-from src import db
+from src import cache, counters, db, metrics, reset, serializers, votes, workers
 from src.settings import config
 from src.routes import setup_routes
 
-def main():
+def create_app():
     app = web.Application()
     setup_routes(app)
     app['config'] = config
+    if metrics.enabled(app):
+        app.middlewares.append(metrics.middleware)
+    app.middlewares.append(db.timeout_middleware)
+    app.on_startup.append(metrics.init_metrics)
+    app.on_startup.append(serializers.init_serializer)
     app.on_startup.append(db.init_pg)
+    app.on_startup.append(db.warm_up)
+    app.on_startup.append(cache.init_cache)
+    app.on_startup.append(reset.init_reset)
+    app.on_startup.append(votes.init_votes)
+    app.on_startup.append(counters.init_counters)
+    app.on_cleanup.append(counters.close_counters)
+    app.on_cleanup.append(reset.close_reset)
     app.on_cleanup.append(db.close_pg)
-    web.run_app(app, port=config['app']['port'])
+    return app
+
+def main():
+    workers.serve(create_app, config)
 
 
 main()
@@ -0,0 +1,4 @@
+-- thread vote totals are maintained by the vote statements themselves
+
+drop trigger if exists new_thread_vote on votes;
+drop function if exists update_thread_votes();
@@ -0,0 +1,19 @@
+-- forum thread/post counters are appended as deltas and folded into forums
+-- by the counters flusher
+
+create unlogged table forum_deltas (
+    forum citext not null,
+    threads int not null,
+    posts bigint not null
+);
+
+create index forum_deltas_forum on forum_deltas(forum);
+
+create or replace function update_forum_threads()
+returns trigger as $$
+begin 
+    insert into forum_deltas values (NEW.forum, 1, 0);
+    insert into forum_users select NEW.forum, nickname, fullname, email, about from users where nickname = NEW.author on conflict do nothing;
+    return NEW;
+end;
+$$ language plpgsql;
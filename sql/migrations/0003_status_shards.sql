@@ -0,0 +1,48 @@
+-- service status reads sharded insert counters kept by statement triggers
+
+create unlogged table stats (
+    entity text,
+    shard int,
+    total bigint not null,
+    primary key (entity, shard)
+);
+
+insert into stats select entity, 0, count from (
+    select 'user' as entity, count(*) from users union all
+    select 'forum', count(*) from forums union all
+    select 'thread', count(*) from threads union all
+    select 'post', count(*) from posts
+) counts;
+
+create function count_inserted()
+returns trigger as $$
+begin 
+    insert into stats select TG_ARGV[0], pg_backend_pid() % 16, count(*) from inserted
+    on conflict (entity, shard) do update set total = stats.total + excluded.total;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger count_users after insert
+on users
+referencing new table as inserted
+for each statement
+execute function count_inserted('user');
+
+create trigger count_forums after insert
+on forums
+referencing new table as inserted
+for each statement
+execute function count_inserted('forum');
+
+create trigger count_threads after insert
+on threads
+referencing new table as inserted
+for each statement
+execute function count_inserted('thread');
+
+create trigger count_posts after insert
+on posts
+referencing new table as inserted
+for each statement
+execute function count_inserted('post');
@@ -0,0 +1,30 @@
+-- converts posts.path from bigint[] to the bytea key used by tables.sql
+
+create or replace function path_root(path bytea)
+returns bigint as $$
+    select ('x' || encode(substring(path from 1 for 8), 'hex'))::bit(64)::bigint;
+$$ language sql immutable;
+
+alter table posts add column path_key bytea;
+
+update posts p set path_key = (
+    select string_agg(int8send(u.id), ''::bytea order by u.n) from unnest(p.path) with ordinality as u(id, n)
+);
+
+drop index if exists post_path_thread;
+drop index if exists post_thread_path;
+drop index if exists post_path;
+drop index if exists post_path1;
+
+alter table posts drop column path;
+alter table posts rename column path_key to path;
+
+create or replace function posts_path()
+returns trigger as $$
+begin 
+    NEW.path = coalesce(NEW.path, ''::bytea) || int8send(NEW.id);
+    return NEW;
+end;
+$$ language plpgsql;
+
+create index post_thread_path ON posts(thread, path);
@@ -0,0 +1,7 @@
+-- hash indexes duplicating the users/threads primary and unique btrees, and
+-- threads(slug, id) which the unique btree on slug already covers
+
+drop index if exists hash_user_key;
+drop index if exists hash_thread_id;
+drop index if exists hash_thread_slug;
+drop index if exists thread_keys;
@@ -0,0 +1,23 @@
+-- forum_users keeps only the (forum, nickname) membership key, profiles are
+-- joined from users at read time
+
+create unlogged table forum_members (
+    forum citext,
+    nickname citext,
+    primary key (forum, nickname)
+);
+
+insert into forum_members select forum, nickname from forum_users on conflict do nothing;
+
+drop table forum_users;
+alter table forum_members rename to forum_users;
+alter index forum_members_pkey rename to forum_users_pkey;
+
+create or replace function update_forum_threads()
+returns trigger as $$
+begin 
+    insert into forum_deltas values (NEW.forum, 1, 0);
+    insert into forum_users values (NEW.forum, NEW.author) on conflict do nothing;
+    return NEW;
+end;
+$$ language plpgsql;
@@ -0,0 +1,34 @@
+-- inserts a batch of posts, validates parents and bumps forum counters and
+-- membership in one call
+
+create function create_posts(thread_id int, thread_slug citext, parent_ids bigint[], author_names citext[], messages text[], created_at timestamp with time zone)
+returns table (id bigint, thread int, forum citext) as $$
+#variable_conflict use_column
+declare
+    th record;
+begin
+    if thread_slug is null then
+        select t.id, t.forum into strict th from threads t where t.id = thread_id;
+    else
+        select t.id, t.forum into strict th from threads t where t.slug = thread_slug;
+    end if;
+
+    if exists (select 1 from unnest(parent_ids) n(parent) where n.parent <> 0 and 
+               not exists (select 1 from posts p where p.id = n.parent and p.thread = th.id)) then
+        raise exception 'parent post not found';
+    end if;
+
+    return query
+    insert into posts (parent, author, forum, thread, message, created, edit, path)
+    select n.parent, n.author, th.forum, th.id, n.message, created_at, false, p.path
+    from unnest(parent_ids, author_names, messages) with ordinality n(parent, author, message, i)
+    left join posts p on p.id = n.parent and n.parent <> 0
+    order by n.i
+    returning posts.id, posts.thread, posts.forum;
+
+    if cardinality(author_names) > 0 then
+        insert into forum_deltas values (th.forum, 0, cardinality(author_names));
+        insert into forum_users select th.forum, unnest(author_names) on conflict do nothing;
+    end if;
+end;
+$$ language plpgsql;
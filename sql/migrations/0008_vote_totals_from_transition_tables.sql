@@ -0,0 +1,44 @@
+-- thread vote totals are applied from the rows a vote statement actually
+-- wrote, so concurrent first votes by one author see each other's row
+
+create function count_votes()
+returns trigger as $$
+begin 
+    if TG_OP = 'INSERT' then
+        update threads t set votes = t.votes + d.delta
+        from (select thread, sum(value) as delta from new_votes group by thread) d
+        where t.id = d.thread;
+    else
+        update threads t set votes = t.votes + d.delta
+        from (select thread, sum(value) as delta 
+              from (select thread, value from new_votes union all select thread, -value from old_votes) v 
+              group by thread) d
+        where t.id = d.thread and d.delta <> 0;
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger count_new_votes after insert
+on votes
+referencing new table as new_votes
+for each statement
+execute function count_votes();
+
+create trigger count_changed_votes after update
+on votes
+referencing old table as old_votes new table as new_votes
+for each statement
+execute function count_votes();
+
+create function cast_votes(thread_id int, author_names citext[], vote_values smallint[])
+returns table (id int, forum citext, title text, author citext, created timestamp with time zone, message text, slug citext, votes int) as $$
+#variable_conflict use_column
+begin
+    insert into votes select n.author, thread_id, n.value from unnest(author_names, vote_values) n(author, value)
+    on conflict (author, thread) do update set value = excluded.value;
+
+    return query
+    select t.id, t.forum, t.title, t.author, t.created, t.message, t.slug, t.votes from threads t where t.id = thread_id;
+end;
+$$ language plpgsql;
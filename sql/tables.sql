@@ -38,7 +38,7 @@ create unlogged table posts (
     message text not null,
     created timestamp with time zone,
     edit boolean,
-    path bigint array,
+    path bytea,
     constraint to_user foreign key (author) references users(nickname) on delete cascade,
     constraint to_forum foreign key (forum) references forums(slug) on delete cascade,
     constraint to_thread foreign key (thread) references threads(id) on delete cascade
@@ -56,17 +56,20 @@ create unlogged table votes (
 create unlogged table forum_users (
     forum citext,
     nickname citext,
-    fullname text,
-    email citext,
-    about text,
     primary key (forum, nickname)
 );
 
+create unlogged table forum_deltas (
+    forum citext not null,
+    threads int not null,
+    posts bigint not null
+);
+
 create function update_forum_threads()
 returns trigger as $$
 begin 
-    update forums set threads = threads + 1 where slug = NEW.forum;
-    insert into forum_users select NEW.forum, nickname, fullname, email, about from users where nickname = NEW.author on conflict do nothing;
+    insert into forum_deltas values (NEW.forum, 1, 0);
+    insert into forum_users values (NEW.forum, NEW.author) on conflict do nothing;
     return NEW;
 end;
 $$ language plpgsql;
@@ -79,7 +82,7 @@ execute function update_forum_threads();
 create function posts_path()
 returns trigger as $$
 begin 
-    NEW.path = array_append(NEW.path, NEW.id);
+    NEW.path = coalesce(NEW.path, ''::bytea) || int8send(NEW.id);
     return NEW;
 end;
 $$ language plpgsql;
@@ -89,34 +92,140 @@ on posts
 for each row
 execute function posts_path();
 
-create function update_thread_votes()
+create function path_root(path bytea)
+returns bigint as $$
+    select ('x' || encode(substring(path from 1 for 8), 'hex'))::bit(64)::bigint;
+$$ language sql immutable;
+
+create function create_posts(thread_id int, thread_slug citext, parent_ids bigint[], author_names citext[], messages text[], created_at timestamp with time zone)
+returns table (id bigint, thread int, forum citext) as $$
+#variable_conflict use_column
+declare
+    th record;
+begin
+    if thread_slug is null then
+        select t.id, t.forum into strict th from threads t where t.id = thread_id;
+    else
+        select t.id, t.forum into strict th from threads t where t.slug = thread_slug;
+    end if;
+
+    if exists (select 1 from unnest(parent_ids) n(parent) where n.parent <> 0 and 
+               not exists (select 1 from posts p where p.id = n.parent and p.thread = th.id)) then
+        raise exception 'parent post not found';
+    end if;
+
+    return query
+    insert into posts (parent, author, forum, thread, message, created, edit, path)
+    select n.parent, n.author, th.forum, th.id, n.message, created_at, false, p.path
+    from unnest(parent_ids, author_names, messages) with ordinality n(parent, author, message, i)
+    left join posts p on p.id = n.parent and n.parent <> 0
+    order by n.i
+    returning posts.id, posts.thread, posts.forum;
+
+    if cardinality(author_names) > 0 then
+        insert into forum_deltas values (th.forum, 0, cardinality(author_names));
+        insert into forum_users select th.forum, unnest(author_names) on conflict do nothing;
+    end if;
+end;
+$$ language plpgsql;
+
+create function count_votes()
 returns trigger as $$
 begin 
     if TG_OP = 'INSERT' then
-        update threads set votes = votes + NEW.value where id = NEW.thread;
-        return NEW;
-    end if;
-    if OLD.value != NEW.value then 
-        update threads set votes = votes + 2 * NEW.value where id = NEW.thread;
-        return NEW;
+        update threads t set votes = t.votes + d.delta
+        from (select thread, sum(value) as delta from new_votes group by thread) d
+        where t.id = d.thread;
+    else
+        update threads t set votes = t.votes + d.delta
+        from (select thread, sum(value) as delta 
+              from (select thread, value from new_votes union all select thread, -value from old_votes) v 
+              group by thread) d
+        where t.id = d.thread and d.delta <> 0;
     end if;
     return null;
 end;
 $$ language plpgsql;
 
-create trigger new_thread_vote after insert or update
+create trigger count_new_votes after insert
 on votes
-for each row
-execute function update_thread_votes();
+referencing new table as new_votes
+for each statement
+execute function count_votes();
+
+create trigger count_changed_votes after update
+on votes
+referencing old table as old_votes new table as new_votes
+for each statement
+execute function count_votes();
+
+create function cast_votes(thread_id int, author_names citext[], vote_values smallint[])
+returns table (id int, forum citext, title text, author citext, created timestamp with time zone, message text, slug citext, votes int) as $$
+#variable_conflict use_column
+begin
+    insert into votes select n.author, thread_id, n.value from unnest(author_names, vote_values) n(author, value)
+    on conflict (author, thread) do update set value = excluded.value;
+
+    return query
+    select t.id, t.forum, t.title, t.author, t.created, t.message, t.slug, t.votes from threads t where t.id = thread_id;
+end;
+$$ language plpgsql;
+
+create unlogged table stats (
+    entity text,
+    shard int,
+    total bigint not null,
+    primary key (entity, shard)
+);
+
+insert into stats select entity, shard, 0 from unnest(array['user', 'forum', 'thread', 'post']) entity, generate_series(0, 15) shard;
+
+create function count_inserted()
+returns trigger as $$
+begin 
+    insert into stats select TG_ARGV[0], pg_backend_pid() % 16, count(*) from inserted
+    on conflict (entity, shard) do update set total = stats.total + excluded.total;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger count_users after insert
+on users
+referencing new table as inserted
+for each statement
+execute function count_inserted('user');
+
+create trigger count_forums after insert
+on forums
+referencing new table as inserted
+for each statement
+execute function count_inserted('forum');
+
+create trigger count_threads after insert
+on threads
+referencing new table as inserted
+for each statement
+execute function count_inserted('thread');
+
+create trigger count_posts after insert
+on posts
+referencing new table as inserted
+for each statement
+execute function count_inserted('post');
 
-create index hash_user_key ON users using hash (nickname);
-create index thread_keys ON threads(slug, id);
 create index thread_forum_created on threads(forum, created);
-create index hash_thread_id ON threads using hash (id);
-create index hash_thread_slug ON threads using hash (slug);
-create index post_path_thread ON posts(path, thread);
-create index post_path ON posts(id, path);
-create index post_path1 ON posts using gin (path);
+create index post_thread_path ON posts(thread, path);
 create index post_thread_parent ON posts(parent, thread, id);
 create index post_thread_created on posts(thread, created);
-create index forum_users_lower on forum_users(lower(nickname));
+create index forum_deltas_forum on forum_deltas(forum);
+
+create table schema_migrations (
+    version int primary key,
+    name text not null,
+    applied timestamp with time zone not null default now()
+);
+
+insert into schema_migrations (version, name) values
+    (1, 'votes_in_statement'), (2, 'forum_deltas'), (3, 'status_shards'), (4, 'path_key'),
+    (5, 'drop_redundant_indexes'), (6, 'compact_forum_users'), (7, 'create_posts_function'),
+    (8, 'vote_totals_from_transition_tables');
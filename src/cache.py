@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+
+from .flight import SingleFlight
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._generations = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires = item
+        if expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return dict(value)
+
+    def version(self):
+        return self._counter
+
+    def set(self, key, value, version = None):
+        if version is not None and self._generations.get(key, self._floor) > version:
+            return
+        self._data[key] = (dict(value), time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last = False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+        self._counter += 1
+        self._generations[key] = self._counter
+        self._generations.move_to_end(key)
+        if len(self._generations) > self.maxsize:
+            _, self._floor = self._generations.popitem(last = False)
+
+    def clear(self):
+        self._data.clear()
+        self._generations.clear()
+        self._counter += 1
+        self._floor = self._counter
+
+    def stats(self):
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+def forum_key(slug):
+    return slug.lower()
+
+def user_key(nick):
+    return nick.lower()
+
+def thread_key(name, value):
+    if name == 'slug':
+        return ('slug', value.lower())
+    return ('id', value)
+
+def remember_slug(app, slug, id, forum):
+    app['cache']['slugs'].set(slug.lower(), {'id': id, 'forum': forum})
+
+def resolve(app, ident):
+    if ident['name'] == 'slug':
+        ref = app['cache']['slugs'].get(ident['value'].lower())
+        if ref is not None:
+            return {'name': 'id', 'value': ref['id']}
+    return ident
+
+def put_thread(app, thread, version = None):
+    cache = app['cache']['threads']
+    cache.set(thread_key('id', thread['id']), thread, version)
+    if thread.get('slug'):
+        cache.set(thread_key('slug', thread['slug']), thread, version)
+        remember_slug(app, thread['slug'], thread['id'], thread['forum'])
+
+def invalidate(app, entries, scopes, publish = True):
+    for name, key in entries:
+        app['cache'][name].invalidate(key)
+    app['flights'].forget(scopes)
+    if publish and app.get('broadcaster') is not None:
+        app['broadcaster'].publish(entries, scopes)
+
+def freeze(key):
+    return tuple(key) if isinstance(key, list) else key
+
+def apply(app, message):
+    entries = [(name, freeze(key)) for name, key in message['entries']]
+    invalidate(app, entries, {freeze(scope) for scope in message['scopes']}, publish = False)
+
+def user_changed(app, nick):
+    invalidate(app, [('users', user_key(nick))], set())
+
+def forum_changed(app, slug):
+    invalidate(app, [('forums', forum_key(slug))], {forum_key(slug)})
+
+def thread_changed(app, thread):
+    keys = [thread_key('id', thread['id'])]
+    if thread.get('slug'):
+        keys.append(thread_key('slug', thread['slug']))
+        remember_slug(app, thread['slug'], thread['id'], thread['forum'])
+    invalidate(app, [('threads', key) for key in keys], set(keys) | {forum_key(thread['forum'])})
+
+def clear(app):
+    for cache in app['cache'].values():
+        cache.clear()
+    app['flights'].clear()
+
+def stats(app):
+    data = {name: cache.stats() for name, cache in app['cache'].items()}
+    data['flights'] = app['flights'].stats()
+    return data
+
+async def init_cache(app):
+    config = app['config'].get('cache', {})
+    size = config.get('size', 10000)
+    ttl = config.get('ttl', 60)
+    app['cache'] = {
+        'forums': LRUCache(size, ttl),
+        'threads': LRUCache(size, ttl),
+        'users': LRUCache(size, ttl),
+        'slugs': LRUCache(config.get('slugs', 100000), config.get('slug_ttl', ttl)),
+    }
+    app['flights'] = SingleFlight()
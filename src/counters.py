@@ -0,0 +1,31 @@
+import asyncio
+
+FLUSH_QUERY = "with d as (delete from forum_deltas returning forum, threads, posts), " + \
+    "s as (select forum, sum(threads) as threads, sum(posts) as posts from d group by forum) " + \
+    "update forums f set threads = f.threads + s.threads, posts = f.posts + s.posts from s where f.slug = s.forum;"
+
+async def flush(app):
+    async with app['db_pool'].acquire() as conn:
+        await conn.execute(FLUSH_QUERY)
+
+async def flusher(app, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush(app)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("unexpected exception while flushing forum counters: ", e)
+
+async def init_counters(app):
+    interval = app['config'].get('counters', {}).get('flush_interval', 1)
+    app['counters_flusher'] = asyncio.ensure_future(flusher(app, interval))
+
+async def close_counters(app):
+    app['counters_flusher'].cancel()
+    try:
+        await app['counters_flusher']
+    except asyncio.CancelledError:
+        pass
+    await flush(app)
\ No newline at end of file
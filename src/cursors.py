@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+
+def encode(sort, desc, key):
+    data = json.dumps([sort, desc, key], separators = (',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def decode(cursor, sort, desc):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_desc, key = json.loads(data)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+    if cursor_sort != sort or cursor_desc != desc:
+        raise ValueError('cursor does not match sort order')
+    try:
+        return parse_key(sort, key)
+    except (TypeError, ValueError):
+        raise ValueError('invalid cursor')
+
+def parse_key(sort, key):
+    if sort == 'flat':
+        created, id = key
+        if not isinstance(created, str) or not is_int(id):
+            raise TypeError
+        return datetime.fromisoformat(created), id
+    if sort == 'tree':
+        if not isinstance(key, str):
+            raise TypeError
+        return bytes.fromhex(key),
+    if not is_int(key):
+        raise TypeError
+    return key,
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def next_key(sort, row):
+    if sort == 'flat':
+        return [row['created'].isoformat(), row['id']]
+    if sort == 'tree':
+        return row['path'].hex()
+    return int.from_bytes(row['path'][:8], 'big')
+
+def page_size(sort, rows):
+    if sort == 'parent_tree':
+        return len({row['path'][:8] for row in rows})
+    return len(rows)
\ No newline at end of file
@@ -1,11 +1,136 @@
-from asyncpg import create_pool
+import asyncio
+import contextlib
+import time
+
+from aiohttp import web
+from asyncpg import Connection, create_pool
+
+from . import metrics, serializers
+from .queries import STATEMENTS
 
 DSN = "postgresql://{user}:{password}@{host}:{port}/{database}"
 
+# connections each worker holds outside its pool: the reset listener
+LISTENERS = 1
+
+class StatementConnection(Connection):
+    pass
+
+class Pool:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+
+    def acquire(self, *, timeout = None):
+        return self._pool.acquire(timeout = timeout if timeout is not None else self._timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+class LazyStatement:
+    def __init__(self, statements, key):
+        self._statements = statements
+        self._key = key
+
+    async def fetch(self, *args, **kwargs):
+        return await (await self._statements.prepare(self._key)).fetch(*args, **kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        return await (await self._statements.prepare(self._key)).fetchrow(*args, **kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        return await (await self._statements.prepare(self._key)).fetchval(*args, **kwargs)
+
+    async def cursor(self, *args, **kwargs):
+        statement = await self._statements.prepare(self._key)
+        async for record in statement.cursor(*args, **kwargs):
+            yield record
+
+# statements are prepared on first use: a connection runs one operation at a time,
+# so preparing the whole registry up front costs a round trip per variant
+class Statements:
+    def __init__(self, conn):
+        self._conn = conn
+        self._prepared = {}
+
+    def __getitem__(self, key):
+        if key not in STATEMENTS:
+            raise KeyError(key)
+        return LazyStatement(self, key)
+
+    async def prepare(self, key):
+        statement = self._prepared.get(key)
+        if statement is None:
+            statement = self._prepared[key] = await self._conn.prepare(STATEMENTS[key])
+        return statement
+
+async def init_connection(conn):
+    await conn.set_builtin_type_codec('citext', codec_name = 'text')
+    conn.statements = Statements(conn)
+
+def pool_bounds(config):
+    pool = config['pool']
+    max_size = pool['max_size']
+    limit = config['postgres'].get('max_connections')
+    if limit:
+        workers = config.get('workers', {}).get('count', 1)
+        max_size = min(max_size, (limit - pool.get('reserved', 0)) // max(workers, 1) - LISTENERS)
+    min_size = min(pool['min_size'], max_size) if pool.get('adaptive') else max_size
+    return min_size, max_size
+
+async def open_pool(app, config):
+    pool_config = app['config']['pool']
+    min_size, max_size = pool_bounds(app['config'])
+    lifetime = pool_config.get('max_inactive_lifetime', 300) if pool_config.get('adaptive') else 0
+    pool = await create_pool(DSN.format(**config), min_size = min_size, max_size = max_size, 
+                             max_queries = pool_config.get('max_queries', 250000), 
+                             max_inactive_connection_lifetime = lifetime, 
+                             init = init_connection, connection_class = StatementConnection)
+    pool = Pool(pool, pool_config.get('acquire_timeout'))
+    if metrics.enabled(app):
+        pool = metrics.InstrumentedPool(pool)
+    return pool
+
+def reader(app):
+    return app.get('db_replica') or app['db_pool']
+
 async def init_pg(app):
     config = app['config']['postgres']
-    pool = await create_pool(DSN.format(**config), min_size = 75, max_size = 75, max_queries = 250000)
-    app['db_pool'] = pool
+    app['db_pool'] = await open_pool(app, config)
+    if app['config'].get('replica'):
+        app['db_replica'] = await open_pool(app, dict(config, **app['config']['replica']))
+
+async def prepare_all(conn):
+    for key in STATEMENTS:
+        await conn.statements.prepare(key)
+
+async def prime(pool, size):
+    async with contextlib.AsyncExitStack() as stack:
+        conns = await asyncio.gather(*[stack.enter_async_context(pool.acquire(timeout = 60)) for _ in range(size)])
+        await asyncio.gather(*[prepare_all(conn) for conn in conns])
+    return len(conns)
+
+async def warm_up(app):
+    if not app['config'].get('server', {}).get('warmup'):
+        return
+
+    started = time.perf_counter()
+    _, max_size = pool_bounds(app['config'])
+    count = await prime(app['db_pool'], max_size)
+    if app.get('db_replica'):
+        count += await prime(app['db_replica'], max_size)
+    print("warmed up {:d} connections with {:d} statements each in {:.1f} ms".format(
+        count, len(STATEMENTS), (time.perf_counter() - started) * 1000))
 
 async def close_pg(app):
-    await app['db_pool'].close()
\ No newline at end of file
+    await app['db_pool'].close()
+    if app.get('db_replica'):
+        await app['db_replica'].close()
+
+@web.middleware
+async def timeout_middleware(request, handler):
+    try:
+        return await handler(request)
+    except asyncio.TimeoutError:
+        error = {'message': 'database is busy'}
+        return serializers.json_response(error, status = 503)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import asyncio
+
+def share(result):
+    data, status = result
+    if isinstance(data, dict):
+        return dict(data), status
+    if isinstance(data, list):
+        return list(data), status
+    return data, status
+
+class SingleFlight:
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+
+    async def do(self, key, load):
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(load())
+            future.add_done_callback(lambda done: self._discard(key, done))
+        else:
+            self.shared += 1
+        return share(await asyncio.shield(future))
+
+    def _discard(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def forget(self, scopes):
+        for key in [key for key in self._calls if key[1] in scopes]:
+            del self._calls[key]
+
+    def clear(self):
+        self._calls.clear()
+
+    def stats(self):
+        return {'in_flight': len(self._calls), 'shared': self.shared}
\ No newline at end of file
@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import os
+import pathlib
+import time
+
+from aiohttp import web
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+current = contextvars.ContextVar('request_stats', default = None)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        total = 0
+        for le, count in zip(BUCKETS + ('+Inf',), self.counts):
+            total += count
+            yield '{:s}_bucket{{{:s},le="{}"}} {:d}'.format(name, labels, le, total)
+        yield '{:s}_sum{{{:s}}} {:.6f}'.format(name, labels, self.sum)
+        yield '{:s}_count{{{:s}}} {:d}'.format(name, labels, self.count)
+
+class RequestStats:
+    __slots__ = ('queries', 'query_time', 'acquire_wait')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.acquire_wait = 0.0
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.acquire_wait = Histogram()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statuses = {}
+
+class Metrics:
+    def __init__(self):
+        self.routes = {}
+
+    def record(self, route, elapsed, status, stats):
+        metrics = self.routes.get(route)
+        if metrics is None:
+            metrics = self.routes[route] = RouteMetrics()
+        metrics.latency.observe(elapsed)
+        metrics.acquire_wait.observe(stats.acquire_wait)
+        metrics.queries += stats.queries
+        metrics.query_time += stats.query_time
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def render(self, worker = None):
+        lines = []
+        for route, metrics in sorted(self.routes.items()):
+            labels = 'route="{:s}"'.format(route)
+            if worker is not None:
+                labels = 'worker="{:d}",'.format(worker) + labels
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append('forums_requests_total{{{:s},status="{:d}"}} {:d}'.format(labels, status, count))
+            lines.extend(metrics.latency.lines('forums_request_seconds', labels))
+            lines.extend(metrics.acquire_wait.lines('forums_pool_acquire_seconds', labels))
+            lines.append('forums_queries_total{{{:s}}} {:d}'.format(labels, metrics.queries))
+            lines.append('forums_query_seconds_total{{{:s}}} {:.6f}'.format(labels, metrics.query_time))
+        return '\n'.join(lines) + '\n'
+
+def timed(method):
+    async def wrapper(*args, **kwargs):
+        stats = current.get()
+        if stats is None:
+            return await method(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - started
+    return wrapper
+
+def timed_cursor(method):
+    async def wrapper(*args, **kwargs):
+        stats = current.get()
+        rows = method(*args, **kwargs).__aiter__()
+        if stats is not None:
+            stats.queries += 1
+        while True:
+            started = time.perf_counter()
+            try:
+                record = await rows.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                if stats is not None:
+                    stats.query_time += time.perf_counter() - started
+            yield record
+    return wrapper
+
+class InstrumentedStatement:
+    def __init__(self, statement):
+        self._statement = statement
+        self.fetch = timed(statement.fetch)
+        self.fetchrow = timed(statement.fetchrow)
+        self.fetchval = timed(statement.fetchval)
+        self.cursor = timed_cursor(statement.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._statement, name)
+
+class InstrumentedStatements:
+    def __init__(self, statements):
+        self._statements = statements
+        self._wrapped = {}
+
+    def __getitem__(self, key):
+        statement = self._wrapped.get(key)
+        if statement is None:
+            statement = self._wrapped[key] = InstrumentedStatement(self._statements[key])
+        return statement
+
+    def __getattr__(self, name):
+        return getattr(self._statements, name)
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self.statements = InstrumentedStatements(conn.statements)
+        for name in ('fetch', 'fetchrow', 'fetchval', 'execute', 'executemany', 'copy_records_to_table'):
+            setattr(self, name, timed(getattr(conn, name)))
+
+    async def prepare(self, *args, **kwargs):
+        return InstrumentedStatement(await self._conn.prepare(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class AcquireContext:
+    def __init__(self, pool, kwargs):
+        self._pool = pool
+        self._kwargs = kwargs
+        self._conn = None
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        self._conn = await self._pool.acquire(**self._kwargs)
+        stats = current.get()
+        if stats is not None:
+            stats.acquire_wait += time.perf_counter() - started
+        return InstrumentedConnection(self._conn)
+
+    async def __aexit__(self, *exc):
+        await self._pool.release(self._conn)
+
+class InstrumentedPool:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def acquire(self, **kwargs):
+        return AcquireContext(self._pool, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+@web.middleware
+async def middleware(request, handler):
+    route = request.match_info.route.name or 'unknown'
+    stats = RequestStats()
+    token = current.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        current.reset(token)
+        request.app['metrics'].record(route, time.perf_counter() - started, status, stats)
+
+def enabled(app):
+    return app['config'].get('metrics', {}).get('enabled', False)
+
+def snapshot_path(directory, pid):
+    return pathlib.Path(directory) / '{:d}.prom'.format(pid)
+
+def write_snapshot(app, directory):
+    path = snapshot_path(directory, os.getpid())
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(app['metrics'].render(os.getpid()))
+    os.replace(tmp, path)
+
+def render_all(app):
+    directory = app['config'].get('metrics', {}).get('directory')
+    if directory is None:
+        return app['metrics'].render()
+
+    write_snapshot(app, directory)
+    return ''.join(path.read_text() for path in sorted(pathlib.Path(directory).glob('*.prom')))
+
+async def snapshots(app, directory, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_snapshot(app, directory)
+        except OSError as e:
+            print("unexpected exception while writing metrics snapshot: ", e)
+
+async def init_metrics(app):
+    app['metrics'] = Metrics()
+    config = app['config'].get('metrics', {})
+    if config.get('directory') is not None:
+        app['metrics_snapshots'] = asyncio.ensure_future(snapshots(app, config['directory'], config.get('interval', 1)))
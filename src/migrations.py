@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import re
+
+import asyncpg
+
+from .db import DSN
+from .settings import BASE_DIR, config
+
+MIGRATIONS_DIR = BASE_DIR / 'sql' / 'migrations'
+FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+CREATE_TABLE = "create table if not exists schema_migrations (version int primary key, name text not null, " + \
+    "applied timestamp with time zone not null default now());"
+
+def available():
+    migrations = []
+    for path in MIGRATIONS_DIR.glob('*.sql'):
+        match = FILENAME.match(path.name)
+        if match is None:
+            raise ValueError('unexpected migration file name: ' + path.name)
+        migrations.append((int(match.group(1)), match.group(2), path))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError('duplicate migration versions in ' + str(MIGRATIONS_DIR))
+    return migrations
+
+async def applied(conn):
+    await conn.execute(CREATE_TABLE)
+    rows = await conn.fetch("select version from schema_migrations;")
+    return {row['version'] for row in rows}
+
+async def version(conn):
+    exists = await conn.fetchval("select to_regclass('schema_migrations') is not null;")
+    if not exists:
+        return 0
+    return await conn.fetchval("select coalesce(max(version), 0) from schema_migrations;")
+
+async def migrate(conn, target = None):
+    done = await applied(conn)
+    ran = []
+    for number, name, path in available():
+        if number in done or (target is not None and number > target):
+            continue
+        async with conn.transaction():
+            await conn.execute(path.read_text())
+            await conn.execute("insert into schema_migrations (version, name) values ($1, $2);", number, name)
+        ran.append((number, name))
+    return ran
+
+async def run(args):
+    conn = await asyncpg.connect(DSN.format(**config['postgres']))
+    try:
+        if args.list:
+            done = await applied(conn)
+            for number, name, _ in available():
+                print('{:04d} {:<32s} {:s}'.format(number, name, 'applied' if number in done else 'pending'))
+            return
+
+        for number, name in await migrate(conn, args.target):
+            print('applied {:04d} {:s}'.format(number, name))
+        print('schema version {:d}'.format(await version(conn)))
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m src.migrations', description = 'apply pending sql/migrations to the configured database')
+    parser.add_argument('--list', action = 'store_true', help = 'show applied and pending migrations')
+    parser.add_argument('--target', type = int, help = 'stop after this version')
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
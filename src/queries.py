@@ -0,0 +1,163 @@
+import itertools
+
+IDENTS = ('id', 'slug')
+SORTS = ('flat', 'tree', 'parent_tree')
+RELATED = ('forum', 'thread', 'user')
+SEEKS = (None, 'since', 'cursor')
+
+THREAD_COLUMNS = "id, forum, title, author, created, message, slug, votes"
+POST_COLUMNS = "id, parent, author, forum, thread, message, created, edit"
+
+FORUM_DELTAS = "left join lateral (select sum(threads) as threads, sum(posts)::bigint as posts from forum_deltas where forum = f.slug) {:s} on true"
+FORUM_SELECT = "select f.slug, f.title, f.author as user, f.threads + coalesce(d.threads, 0) as threads, " + \
+    "f.posts + coalesce(d.posts, 0) as posts from forums f " + FORUM_DELTAS.format('d') + " where f.slug = $1;"
+
+FORUM_PARENT = "(select slug from forums where slug = $1) f"
+THREAD_PARENT = "(select id from threads where {:s} = $1) th"
+
+def with_parent(parent, page):
+    return "select page.* from " + parent + " left join lateral (" + page + ") page on true;"
+
+def forum_threads(desc, since):
+    query = "select " + THREAD_COLUMNS + " from threads where forum = $1 "
+    counter = 2
+    if since:
+        query += "and created {:s} ${:d} ".format('<=' if desc else '>=', counter)
+        counter += 1
+    query += "order by created "
+    if desc:
+        query += "desc "
+    return with_parent(FORUM_PARENT, query + "limit ${:d}".format(counter))
+
+def thread_posts(name, sort, desc, seek):
+    return with_parent(THREAD_PARENT.format(name), thread_posts_page(sort, desc, seek))
+
+def thread_posts_page(sort, desc, seek):
+    op = '<' if desc else '>'
+    if sort == 'flat':
+        query = "select " + POST_COLUMNS + " from posts where thread = th.id "
+        counter = 2
+        if seek == 'since':
+            query += "and id {:s} $2 ".format(op)
+            counter = 3
+        elif seek == 'cursor':
+            query += "and (created, id) {:s} ($2, $3) ".format(op)
+            counter = 4
+        query += "order by created desc, id desc " if desc else "order by created, id "
+        return query + "limit ${:d}".format(counter)
+
+    if sort == 'tree':
+        query = "select " + POST_COLUMNS + ", path from posts where thread = th.id "
+        if seek == 'since':
+            query += "and path {:s} (select path from posts where id = $2) ".format(op)
+        elif seek == 'cursor':
+            query += "and path {:s} $2::bytea ".format(op)
+        query += "order by path "
+        if desc:
+            query += "desc "
+        return query + "limit ${:d}".format(3 if seek else 2)
+
+    query = "select " + ", ".join("p." + column for column in POST_COLUMNS.split(", ")) + ", p.path " + \
+        "from (select id from posts where thread = th.id and parent = 0 "
+    if seek == 'since':
+        query += "and id {:s} (select path_root(path) from posts where id = $2) ".format(op)
+    elif seek == 'cursor':
+        query += "and id {:s} $2 ".format(op)
+    query += "order by id {:s}limit ${:d}) r ".format('desc ' if desc else '', 3 if seek else 2)
+    query += "cross join lateral (select " + POST_COLUMNS + ", path from posts " + \
+        "where thread = th.id and path >= int8send(r.id) and path < int8send(r.id + 1)) p "
+    return query + "order by r.id{:s}, p.path".format(' desc' if desc else '')
+
+def forum_users(desc, since):
+    query = "select u.nickname, u.fullname, u.email, u.about from forum_users fu join users u on u.nickname = fu.nickname where fu.forum = $1 "
+    counter = 2
+    if since:
+        query += "and fu.nickname {:s} ${:d} ".format('<' if desc else '>', counter)
+        counter += 1
+    query += "order by fu.nickname "
+    if desc:
+        query += "desc "
+    return with_parent(FORUM_PARENT, query + "limit ${:d}".format(counter))
+
+POST_RELATED = {
+    'post': ('p', None, ['id', 'parent', 'author', 'forum', 'thread', 'message', 'created', 'edit as isEdited']),
+    'forum': ('f', "join forums f on f.slug = p.forum " + FORUM_DELTAS.format('fd'), 
+              ['slug', 'title', 'author as user', 'threads + coalesce(fd.threads, 0) as threads', 'posts + coalesce(fd.posts, 0) as posts']),
+    'thread': ('t', "join threads t on t.id = p.thread", ['id', 'forum', 'title', 'author', 'created', 'message', 'slug', 'votes']),
+    'user': ('u', "join users u on u.nickname = p.author", ['nickname', 'fullname', 'email', 'about']),
+}
+
+def post_query(related):
+    columns = []
+    joins = ""
+    for name in ('post',) + related:
+        alias, join, fields = POST_RELATED[name]
+        for field in fields:
+            column, _, label = field.partition(' as ')
+            columns.append('{0:s}.{1:s} as "{0:s}_{2:s}"'.format(alias, column, label or column))
+        if join:
+            joins += " " + join
+    return "select {:s} from posts p{:s} where p.id = $1;".format(", ".join(columns), joins)
+
+SIGNUP = "insert into users values($1, $2, $3, $4);"
+SIGNUP_CONFLICTS = "select nickname, fullname, email, about from users where nickname = $1 or email = $2;"
+
+CREATE_FORUM = "with u as (select nickname from users where nickname = $3), " + \
+    "ins as (insert into forums select $1, $2, u.nickname, 0, 0 from u on conflict do nothing returning slug, title, author, threads, posts) " + \
+    "select 201 as status, slug, title, author as user, threads, posts from ins " + \
+    "union all select 409, f.slug, f.title, f.author, f.threads + coalesce(d.threads, 0), f.posts + coalesce(d.posts, 0) " + \
+    "from forums f " + FORUM_DELTAS.format('d') + " where f.slug = $1 and exists (select 1 from u) " + \
+    "union all select 404, null, null, null, null, null where not exists (select 1 from u);"
+
+CREATE_THREAD = "with u as (select nickname from users where nickname = $1), f as (select slug from forums where slug = $2), " + \
+    "ins as (insert into threads (title, author, forum, message, slug, created, votes) select $3, u.nickname, f.slug, $4, $5, $6, 0 " + \
+    "from u, f on conflict do nothing returning " + THREAD_COLUMNS + ") " + \
+    "select 201 as status, " + THREAD_COLUMNS + " from ins " + \
+    "union all select 409, " + THREAD_COLUMNS + " from threads where slug = $5 and exists (select 1 from u) and exists (select 1 from f) " + \
+    "union all select 404, null, null, null, null, null, null, null, null where not exists (select 1 from u) or not exists (select 1 from f);"
+
+VOTE = "select v.* from threads th, cast_votes(th.id, array[$2::citext], array[$3::smallint]) v where th.{:s} = $1;"
+
+VOTE_BATCH = "select v.* from threads th, cast_votes(th.id, $2::citext[], $3::smallint[]) v where th.{:s} = $1;"
+
+def update_set(fields, where):
+    assignments = ["{:s} = ${:d}".format(field, i + 1) for i, field in enumerate(fields)]
+    return "update {:s} set {:s} where {:s} = ${:d} returning *;".format(where[0], ", ".join(assignments), where[1], len(fields) + 1)
+
+def subsets(fields):
+    for n in range(1, len(fields) + 1):
+        yield from itertools.combinations(fields, n)
+
+PROFILE_FIELDS = ('fullname', 'email', 'about')
+THREAD_FIELDS = ('title', 'message')
+
+STATEMENTS = {}
+for desc, since in itertools.product((False, True), repeat = 2):
+    STATEMENTS[('forum_threads', desc, since)] = forum_threads(desc, since)
+    STATEMENTS[('forum_users', desc, since)] = forum_users(desc, since)
+for name, sort, desc, seek in itertools.product(IDENTS, SORTS, (False, True), SEEKS):
+    STATEMENTS[('thread_posts', name, sort, desc, seek)] = thread_posts(name, sort, desc, seek)
+for fields in subsets(PROFILE_FIELDS):
+    STATEMENTS[('update_profile', fields)] = update_set(fields, ('users', 'nickname'))
+for name in IDENTS:
+    STATEMENTS[('thread', name)] = "select " + THREAD_COLUMNS + " from threads where {:s} = $1;".format(name)
+    for fields in subsets(THREAD_FIELDS):
+        STATEMENTS[('update_thread', name, fields)] = update_set(fields, ('threads', name))
+for i in range(8):
+    related = tuple(name for j, name in enumerate(RELATED) if i & (1 << j))
+    STATEMENTS[('post', related)] = post_query(related)
+for name in IDENTS:
+    STATEMENTS[('vote', name)] = VOTE.format(name)
+    STATEMENTS[('vote_batch', name)] = VOTE_BATCH.format(name)
+STATEMENTS['forum'] = FORUM_SELECT
+STATEMENTS['create_forum'] = CREATE_FORUM
+STATEMENTS['create_thread'] = CREATE_THREAD
+STATEMENTS['create_posts'] = "select id, thread, forum from create_posts($1, $2, $3, $4, $5, $6);"
+STATEMENTS['status'] = "select entity, sum(total)::bigint as total from stats group by entity;"
+STATEMENTS['profile'] = "select nickname, fullname, email, about from users where nickname = $1;"
+
+def flag(value):
+    return value == 'true' or value is True
+
+def fields_of(form, names):
+    return tuple(name for name in names if form.get(name))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+
+import asyncpg
+from asyncpg.exceptions import LockNotAvailableError
+
+from . import cache
+from .db import DSN
+
+CHANNEL = 'forums_reset'
+
+TABLES = ('users', 'forums', 'threads', 'posts', 'votes', 'forum_users', 'forum_deltas')
+
+RESET_STATS_QUERY = "update stats set total = 0;"
+
+RESET_QUERY = "truncate " + ", ".join(TABLES) + " restart identity; " + RESET_STATS_QUERY + " notify " + CHANNEL + ";"
+
+NOTIFY_QUERY = "select pg_notify($1, payload) from unnest($2::text[]) payload;"
+
+EMPTY_QUERY = "select coalesce(sum(total), 0) = 0 from (select total from stats for update) s;"
+
+async def truncate(conn, lock_timeout):
+    async with conn.transaction():
+        if lock_timeout:
+            await conn.execute("set local lock_timeout = {:d};".format(lock_timeout))
+        await conn.execute(RESET_QUERY)
+
+async def reset_fast(conn, config):
+    async with conn.transaction():
+        if await conn.fetchval(EMPTY_QUERY):
+            return
+
+    for _ in range(config.get('attempts', 20)):
+        try:
+            await truncate(conn, config.get('lock_timeout', 50))
+            return
+        except LockNotAvailableError:
+            await asyncio.sleep(config.get('lock_timeout', 50) / 1000)
+    await truncate(conn, None)
+
+async def reset(app):
+    config = app['config'].get('clear', {})
+    async with app['db_pool'].acquire() as conn:
+        if config.get('mode', 'truncate') == 'fast':
+            await reset_fast(conn, config)
+        else:
+            await truncate(conn, None)
+    cache.clear(app)
+
+class Broadcaster:
+    def __init__(self, app):
+        self.app = app
+        self.pending = []
+        self.task = None
+
+    def publish(self, entries, scopes):
+        self.pending.append({'pid': os.getpid(), 'entries': entries, 'scopes': list(scopes)})
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.send())
+
+    async def send(self):
+        await asyncio.sleep(0)
+        messages, self.pending, self.task = self.pending, [], None
+        payloads = [json.dumps(message) for message in messages]
+        try:
+            async with self.app['db_pool'].acquire() as conn:
+                await conn.execute(NOTIFY_QUERY, CHANNEL, payloads)
+        except Exception as e:
+            print("unexpected exception while broadcasting cache invalidations: ", e)
+
+def on_reset(app):
+    def listener(conn, pid, channel, payload):
+        if not payload:
+            cache.clear(app)
+            return
+        message = json.loads(payload)
+        if message['pid'] != os.getpid():
+            cache.apply(app, message)
+    return listener
+
+def on_terminated(app):
+    def listener(conn):
+        cache.clear(app)
+        if not app['reset_closing']:
+            print("reset listener connection lost, reconnecting")
+            app['reset_reconnect'] = asyncio.ensure_future(reconnect(app))
+    return listener
+
+async def listen(app):
+    conn = await asyncpg.connect(DSN.format(**app['config']['postgres']))
+    await conn.add_listener(CHANNEL, on_reset(app))
+    conn.add_termination_listener(on_terminated(app))
+    app['reset_listener'] = conn
+
+async def reconnect(app):
+    delay = 0.1
+    while True:
+        try:
+            await listen(app)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("unexpected exception while reconnecting reset listener: ", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+            continue
+        cache.clear(app)
+        return
+
+async def init_reset(app):
+    app['reset_closing'] = False
+    app['reset_reconnect'] = None
+    if app['config'].get('workers', {}).get('count', 1) > 1:
+        app['broadcaster'] = Broadcaster(app)
+    await listen(app)
+
+async def close_reset(app):
+    app['reset_closing'] = True
+    if app['reset_reconnect'] is not None:
+        app['reset_reconnect'].cancel()
+    await app['reset_listener'].close()
\ No newline at end of file
@@ -0,0 +1,80 @@
+import json
+from datetime import date
+
+from aiohttp import web
+from asyncpg import Record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# neither backend encodes mappings other than dict, so each Record is still
+# copied into one here, inside the encoder instead of in the usecases
+def default(obj):
+    if isinstance(obj, Record):
+        return dict(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError('{:s} is not JSON serializable'.format(type(obj).__name__))
+
+def stdlib_dumps(data):
+    return json.dumps(data, default = default).encode()
+
+def orjson_dumps(data):
+    return orjson.dumps(data, default = default)
+
+BACKENDS = {'stdlib': (stdlib_dumps, json.loads)}
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson_dumps, orjson.loads)
+
+dumps, loads = BACKENDS['orjson' if orjson is not None else 'stdlib']
+
+def set_backend(name):
+    global dumps, loads
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name not in BACKENDS:
+        raise ValueError('json backend {:s} is not available'.format(name))
+    dumps, loads = BACKENDS[name]
+
+def json_response(data, status = 200):
+    return web.Response(body = dumps(data), status = status, content_type = 'application/json')
+
+async def stream_response(request, rows, chunk_size = 65536):
+    try:
+        data, status = await rows.__anext__()
+        if status != 200:
+            return json_response(data, status = status)
+
+        response = web.StreamResponse(status = status)
+        response.content_type = 'application/json'
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+
+        chunk = bytearray(b'[')
+        separator = b''
+        async for row in rows:
+            chunk += separator
+            chunk += dumps(row)
+            separator = b','
+            if len(chunk) >= chunk_size:
+                await response.write(bytes(chunk))
+                chunk.clear()
+        chunk += b']'
+        await response.write(bytes(chunk))
+        await response.write_eof()
+        return response
+
+    finally:
+        await rows.aclose()
+
+def streaming(app, limit):
+    min_limit = app['config'].get('stream', {}).get('min_limit')
+    return min_limit is not None and limit >= min_limit
+
+async def read_json(request):
+    return loads(await request.read())
+
+async def init_serializer(app):
+    set_backend(app['config'].get('json', {}).get('backend', 'auto'))
\ No newline at end of file
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import random
+
+from aiohttp.web_log import AccessLogger
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+class SampledAccessLogger(AccessLogger):
+    rate = 1.0
+
+    def log(self, request, response, time):
+        if random.random() < self.rate:
+            super().log(request, response, time)
+
+def install_loop(config):
+    name = config.get('server', {}).get('loop', 'auto')
+    if name == 'asyncio':
+        return name
+    if uvloop is None:
+        if name == 'uvloop':
+            raise RuntimeError('uvloop is not installed')
+        return 'asyncio'
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return 'uvloop'
+
+def run_options(config):
+    server = config.get('server', {})
+    options = {
+        'backlog': config['app'].get('backlog', 128),
+        'keepalive_timeout': server.get('keepalive_timeout', 75),
+    }
+
+    mode = server.get('access_log', 'all')
+    if mode == 'none':
+        options['access_log'] = None
+        return options
+
+    logger = logging.getLogger('aiohttp.access')
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+    if mode == 'sample':
+        SampledAccessLogger.rate = server.get('access_log_rate', 0.01)
+        options['access_log_class'] = SampledAccessLogger
+    return options
\ No newline at end of file
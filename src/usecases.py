@@ -1,236 +1,205 @@
-from asyncpg.exceptions import UniqueViolationError, ForeignKeyViolationError
+from asyncpg.exceptions import ForeignKeyViolationError, NoDataFoundError
 
 from datetime import datetime
 
-def format_datetime(x):
-    x['created'] = x['created'].isoformat()
-    return x
+from . import cache, cursors, db, reset
+from .queries import SORTS, RELATED, PROFILE_FIELDS, THREAD_FIELDS, SIGNUP, SIGNUP_CONFLICTS, flag, fields_of
 
 async def signup(app, nick, form):
     async with app['db_pool'].acquire() as conn:
         try:
-            await conn.execute("insert into users values($1, $2, $3, $4);", nick, form['fullname'], form['email'], form['about'])
+            await conn.execute(SIGNUP, nick, form['fullname'], form['email'], form['about'])
             form['nickname'] = nick
             return form, 201
 
         except:
-            users = await conn.fetch("select nickname, fullname, email, about from users where nickname = $1 or email = $2;", nick, form['email'])
-            return list(map(dict, users)), 409
+            users = await conn.fetch(SIGNUP_CONFLICTS, nick, form['email'])
+            return users, 409
 
 async def get_profile(app, nick):
+    user = app['cache']['users'].get(cache.user_key(nick))
+    if user is not None:
+        return user, 200
+
+    version = app['cache']['users'].version()
     async with app['db_pool'].acquire() as conn:
         try:
-            user = await conn.fetchrow("select nickname, fullname, email, about from users where nickname = $1;", nick)
-            return dict(user), 200
+            user = await conn.statements['profile'].fetchrow(nick)
+            user = dict(user)
+            app['cache']['users'].set(cache.user_key(nick), user, version)
+            return user, 200
 
         except:
             error = {'message': 'user not found'}
             return error, 404
 
 async def update_profile(app, nick, form):
-    query = "update users set "
-    counter = 1
-    fields = []
-    if form.get('fullname'):
-        query += ("fullname = ${:d}".format(counter))
-        counter += 1
-        fields.append(form['fullname'])
-    if form.get('email'):
-        query += "," if counter > 1 else ""
-        query += ("email = ${:d}".format(counter))
-        counter += 1
-        fields.append(form['email'])
-    if form.get('about'):
-        query += "," if counter > 1 else ""
-        query += ("about = ${:d}".format(counter))
-        counter += 1
-        fields.append(form['about'])
-    query += (" where nickname = ${:d} returning *;".format(counter))
-    fields.append(nick)
+    fields = fields_of(form, PROFILE_FIELDS)
 
     async with app['db_pool'].acquire() as conn:
         try:
-            user = await conn.fetchrow(query, *fields)
+            user = await conn.statements[('update_profile', fields)].fetchrow(*[form[field] for field in fields], nick)
             if user is None:
                 error = {'message': 'user not found'}
                 return error, 404
 
-            return dict(user), 200
+            user = dict(user)
+            cache.user_changed(app, nick)
+            return user, 200
 
         except:
             error = {'message': 'user cannot be updated'}
             return error, 409
 
-async def create_forum(app, form):
-     async with app['db_pool'].acquire() as conn:
-        try:
-            user = await conn.fetchrow("select nickname from users where nickname = $1;", form['user'])
-            if user is None:
-                error = {'message': 'user not found'}
-                return error, 404
-
-            forum = await conn.fetchrow("insert into forums values($1, $2, $3, 0, 0) returning slug, title, author as user, posts, threads;", 
-                                        form['slug'], form['title'], user['nickname'])
-            return dict(forum), 201
+def split_status(row):
+    return {key: value for key, value in row.items() if key != 'status'}, row['status']
 
-        except:
-            forum = await conn.fetchrow("select slug, title, author as user, threads, posts from forums where slug = $1;", form['slug'])
+async def create_forum(app, form):
+    async with app['db_pool'].acquire() as conn:
+        row = await conn.statements['create_forum'].fetchrow(form['slug'], form['title'], form['user'])
+        if row is None:
+            forum = await conn.statements['forum'].fetchrow(form['slug'])
             return dict(forum), 409
 
+    if row['status'] == 404:
+        error = {'message': 'user not found'}
+        return error, 404
+    return split_status(row)
+
 async def get_forum(app, slug):
+    forum = app['cache']['forums'].get(cache.forum_key(slug))
+    if forum is not None:
+        return forum, 200
+    return await app['flights'].do(('forum', cache.forum_key(slug)), lambda: load_forum(app, slug))
+
+async def load_forum(app, slug):
+    version = app['cache']['forums'].version()
     async with app['db_pool'].acquire() as conn:
         try:
-            forum = await conn.fetchrow("select slug, title, author as user, threads, posts from forums where slug = $1;", slug)
-            return dict(forum), 200
+            forum = await conn.statements['forum'].fetchrow(slug)
+            forum = dict(forum)
+            app['cache']['forums'].set(cache.forum_key(slug), forum, version)
+            return forum, 200
 
         except:
             error = {'message': 'forum not found'}
             return error, 404
 
 async def create_thread(app, slug, form):
+    created = datetime.now()
+    if form.get('created'):
+        form['created'] = form['created'].replace('Z', '+00:00')
+        created = datetime.fromisoformat(form['created'])
+
     async with app['db_pool'].acquire() as conn:
-        try:
-            data = await conn.fetch("select nickname as slug from users where nickname = $1 union all select slug from forums where slug = $2;", 
-                                    form['author'], slug)
-            data = list(map(dict, data))
-            if len(data) < 2:
-                error = {'message': 'user or forum not found'}
-                return error, 404
+        row = await conn.statements['create_thread'].fetchrow(form['author'], slug, form['title'], form['message'], form.get('slug'), created)
+        if row is None:
+            thread = await conn.statements[('thread', 'slug')].fetchrow(form['slug'])
+            return dict(thread), 409
 
-            created = datetime.now()
-            if form.get('created'):
-                form['created'] = form['created'].replace('Z', '+00:00')
-                created = datetime.fromisoformat(form['created'])
-            thread = await conn.fetchrow("insert into threads values(default, $1, $2, $3, $4, $5, $6, 0) returning *;", 
-                                        form['title'], data[0]['slug'], data[1]['slug'], form['message'], form.get('slug'), created)
-            thread = dict(thread)
-            format_datetime(thread)
-            return thread, 201
+    if row['status'] == 404:
+        error = {'message': 'user or forum not found'}
+        return error, 404
 
-        except:
-            thread = await conn.fetchrow("select id, title, author, votes, message, forum, slug, created from threads where slug = $1;", form['slug'])
-            thread = dict(thread)
-            format_datetime(thread)
-            return thread, 409
+    thread, status = split_status(row)
+    if status == 201:
+        cache.forum_changed(app, slug)
+        cache.thread_changed(app, thread)
+    return thread, status
 
 async def create_post(app, ident, posts):
+    ident = cache.resolve(app, ident)
+    created = datetime.now()
+    thread_id, thread_slug = (ident['value'], None) if ident['name'] == 'id' else (None, ident['value'])
+    parents = [post.get('parent') or 0 for post in posts]
+    authors = [post['author'] for post in posts]
+    messages = [post['message'] for post in posts]
+
     async with app['db_pool'].acquire() as conn:
-        async with conn.transaction():
-            try:
-                thread = await conn.fetchrow("select id, forum from threads where {:s} = $1;".format(ident['name']), ident['value'])
-                if thread is None:
-                    error = {'message': 'thread not found'}
-                    return error, 404
-
-                query = await conn.prepare("select thread, path from posts where id = $1;")
-                for post in posts:
-                    if post.get('parent'):
-                        result = await query.fetchrow(post.get('parent'))
-                        if result is None or result['thread'] != thread['id']:
-                            raise ValueError
-                        post['path'] = result['path']
-
-
-                created = datetime.now()
-                query = "insert into posts values (default, $1, $2, $3, $4, $5, $6, false, $7)"
-                query2 = "insert into forum_users select $1, nickname, fullname, email, about from users where nickname in ($2"
-                for i in range(1, len(posts)):
-                    idx = [i * 7 + j for j in range(1, 8)]
-                    query += ",(default, ${:d}, ${:d}, ${:d}, ${:d}, ${:d}, ${:d}, false, ${:d})".format(*idx)
-                    query2 += ",${:d}".format(i + 2)
-                query += " returning id;"
-                query2 += ") on conflict do nothing;"
-
-                fields = []
-                fu = []
-                for post in posts:
-                    fields += [post.get('parent', 0), post['author'], thread['forum'], thread['id'], post['message'], created, post.get('path', [])]
-                    fu.append(post['author'])
-
-                if len(fields) > 0:
-                    result = await conn.fetch(query, *fields)
-                    result = list(map(dict, result))
-                    for i in range(len(posts)):
-                        posts[i]['id'] = result[i]['id']
-                        posts[i]['thread'] = thread['id']
-                        posts[i]['forum'] = thread['forum']
-                        posts[i]['created'] = created.isoformat()
-                    await conn.execute("update forums set posts = posts + {:d} where slug = $1;".format(len(posts)), thread['forum'])
-                    await conn.execute(query2, thread['forum'], *fu)
-                return posts, 201
-
-            except ForeignKeyViolationError:
-                error = {'message': 'author not found'}
-                return error, 404
+        try:
+            rows = await conn.statements['create_posts'].fetch(thread_id, thread_slug, parents, authors, messages, created)
+
+        except NoDataFoundError:
+            error = {'message': 'thread not found'}
+            return error, 404
+
+        except ForeignKeyViolationError:
+            error = {'message': 'author not found'}
+            return error, 404
 
-            except:
-                error = {'message': 'cannot create posts'}
-                return error, 409
+        except:
+            error = {'message': 'cannot create posts'}
+            return error, 409
+
+    for post, row in zip(posts, rows):
+        post['id'] = row['id']
+        post['thread'] = row['thread']
+        post['forum'] = row['forum']
+        post['created'] = created
+    if len(rows) > 0:
+        cache.forum_changed(app, rows[0]['forum'])
+    return posts, 201
 
 async def get_thread(app, ident):
+    ident = cache.resolve(app, ident)
+    key = cache.thread_key(ident['name'], ident['value'])
+    thread = app['cache']['threads'].get(key)
+    if thread is not None:
+        return thread, 200
+    return await app['flights'].do(('thread', key), lambda: load_thread(app, ident))
+
+async def load_thread(app, ident):
+    version = app['cache']['threads'].version()
     async with app['db_pool'].acquire() as conn:
         try:
-            thread = await conn.fetchrow("select id, forum, title, author, created, message, slug, votes from threads where {:s} = $1;".
-                                         format(ident['name']), ident['value'])
+            thread = await conn.statements[('thread', ident['name'])].fetchrow(ident['value'])
             thread = dict(thread)
-            format_datetime(thread)
+            cache.put_thread(app, thread, version)
             return thread, 200
 
         except:
             error = {'message': 'thread not found'}
             return error, 404
 
-async def forum_threads(app, slug, limit, since, desc):
-    counter = 2
+def forum_threads_query(limit, since, desc):
     fields = []
-    query = "select id, forum, title, author, created, message, slug, votes from threads where forum = $1 "
     if since:
-        if desc == 'true':
-            query += "and created <= ${:d} ".format(counter)
-        else:
-            query += "and created >= ${:d} ".format(counter)
-
         since = since.replace('Z', '+00:00')
-        since = datetime.fromisoformat(since)
-        fields.append(since)
-        counter += 1
-
-    query += "order by created "   
-    if desc == 'true':
-        query += "desc "
-    query += "limit ${:d};".format(counter)
+        fields.append(datetime.fromisoformat(since))
     fields.append(limit)
+    return ('forum_threads', flag(desc), bool(since)), fields
 
-    async with app['db_pool'].acquire() as conn:
-        forum = await conn.fetchrow("select slug from forums where slug = $1;", slug)
-        if forum is None:
-            error = {'message': 'forum not found'}
-            return error, 404
-
-        threads = await conn.fetch(query, slug, *fields)
-        threads = list(map(dict, threads))
-        threads = list(map(format_datetime, threads))
-        return threads, 200
+async def forum_threads(app, slug, limit, since, desc):
+    if not since:
+        key = ('forum_threads', cache.forum_key(slug), limit, flag(desc))
+        return await app['flights'].do(key, lambda: load_forum_threads(app, slug, limit, since, desc))
+    return await load_forum_threads(app, slug, limit, since, desc)
+
+async def load_forum_threads(app, slug, limit, since, desc):
+    query, fields = forum_threads_query(limit, since, desc)
+    async with db.reader(app).acquire() as conn:
+        threads = await conn.statements[query].fetch(slug, *fields)
+    if len(threads) == 0:
+        error = {'message': 'forum not found'}
+        return error, 404
+    return page(threads), 200
 
 async def clear(app):
-    async with app['db_pool'].acquire() as conn:
-        try:
-            await conn.execute("truncate users cascade;")
-            return 200
+    try:
+        await reset.reset(app)
+        return 200
 
-        except Exception as e:
-            print("unexpected exception while clearing db: ", e)
-            return 500
+    except Exception as e:
+        print("unexpected exception while clearing db: ", e)
+        return 500
 
 async def status(app):
-    async with app['db_pool'].acquire() as conn:
+    async with db.reader(app).acquire() as conn:
         try:
-            data = await conn.fetch("select count(nickname) from users union all select count(slug) from forums " + \
-                "union all select count(id) from threads union all select count(id) from posts;")
-            response = {}
-            labels = ['user', 'forum', 'thread', 'post']
-            for i in range(len(data)):
-                response[labels[i]] = data[i].get('count')
+            data = await conn.statements['status'].fetch()
+            response = {'user': 0, 'forum': 0, 'thread': 0, 'post': 0}
+            for row in data:
+                response[row['entity']] = row['total']
             return response, 200
 
         except Exception as e:
@@ -238,147 +207,150 @@ async def status(app):
             return None, 500
 
 async def new_vote(app, ident, vote):
+    ident = cache.resolve(app, ident)
+    if app.get('votes') is not None:
+        return await app['votes'].submit(ident, vote['nickname'], vote['voice'])
+    return await cast_vote(app, ident, vote['nickname'], vote['voice'])
+
+async def cast_vote(app, ident, nickname, voice):
     async with app['db_pool'].acquire() as conn:
         try:
-            thread = await conn.fetchrow("select id from threads where {:s} = $1;".format(ident['name']), ident['value'])
-            if thread is None:
-                error = {'message': 'thread not found'}
-                return error, 404
-                
-            await conn.execute("insert into votes values($1, $2, $3);", vote['nickname'], thread['id'], vote['voice'])
-            return await get_thread(app, ident)
-
-        except UniqueViolationError:
-            await conn.execute("update votes set value = $1 where author = $2 and thread = $3;", vote['voice'], vote['nickname'], thread['id'])
-            return await get_thread(app, ident)
-
+            thread = await conn.statements[('vote', ident['name'])].fetchrow(ident['value'], nickname, voice)
         except ForeignKeyViolationError:
             error = {'message': 'user not found'}
             return error, 404
 
+    if thread is None:
+        error = {'message': 'thread not found'}
+        return error, 404
+
+    thread = dict(thread)
+    cache.thread_changed(app, thread)
+    return thread, 200
+
 async def update_thread(app, ident, form):
-    query = "update threads set "
-    counter = 1
-    fields = []
-    if form.get('title'):
-        query += ("title = ${:d}".format(counter))
-        counter += 1
-        fields.append(form['title'])
-    if form.get('message'):
-        query += "," if counter > 1 else ""
-        query += ("message = ${:d}".format(counter))
-        counter += 1
-        fields.append(form['message'])
-    query += (" where {:s} = ${:d} returning *;".format(ident['name'], counter))
-    fields.append(ident['value'])
+    ident = cache.resolve(app, ident)
+    fields = fields_of(form, THREAD_FIELDS)
 
     async with app['db_pool'].acquire() as conn:
         try:
-            thread = await conn.fetchrow(query, *fields)
+            thread = await conn.statements[('update_thread', ident['name'], fields)].fetchrow(*[form[field] for field in fields], ident['value'])
             if thread is None:
                 error = {'message': 'thread not found'}
                 return error, 404
 
             thread = dict(thread)
-            format_datetime(thread)
+            cache.thread_changed(app, thread)
             return thread, 200
 
         except:
             error = {'message': 'thread cannot be updated'}
             return error, 409
 
-async def thread_posts(app, ident, limit, since, sort, desc):
-    counter = 2
-    fields = []
-    query = "select id, parent, author, forum, thread, message, created, edit from posts where thread = $1 "
-
-    if sort == 'flat':
-        if since:
-            if desc == 'true':
-                query += "and id < ${:d} ".format(counter)
-            else:
-                query += "and id > ${:d} ".format(counter)
-
-            fields.append(since)
-            counter += 1
-        if desc == 'true':
-            query += "order by created desc, id desc "   
-        else:
-            query += "order by created, id "   
-        query += "limit ${:d};".format(counter)
-
-    elif sort == 'tree':
-        if since:
-            if desc == 'true':
-                query += "and path < (select path from posts where id = ${:d}) ".format(counter)
-            else:
-                query += "and path > (select path from posts where id = ${:d}) ".format(counter)
-
-            fields.append(since)
-            counter += 1
-        query += "order by path " 
-        if desc == 'true':
-            query += "desc "       
-        query += "limit ${:d};".format(counter)
-
-    elif sort == 'parent_tree':
-        query += "and path[1] in (select id from posts where thread = $1 and parent = 0 "
-        if since:
-            if desc == 'true':
-                query += "and path[1] < (select path[1] from posts where id = ${:d}) ".format(counter)
-            else:
-                query += "and path[1] > (select path[1] from posts where id = ${:d}) ".format(counter)
-
-            fields.append(since)
-            counter += 1
-
-        if desc == 'true':
-            query += "order by id desc limit ${:d}) order by path[1] desc, path;".format(counter)
-        else:
-            query += "order by id limit ${:d}) order by path[1], path;".format(counter)
-
-    fields.append(limit)
+def page(rows):
+    if rows[0][0] is None:
+        return []
+    return rows
 
-    async with app['db_pool'].acquire() as conn:
-        thread = await conn.fetchrow("select id from threads where {:s} = $1;".format(ident['name']), ident['value'])
-        if thread is None:
-            error = {'message': 'thread not found'}
-            return error, 404
-
-        posts = await conn.fetch(query, thread['id'], *fields)
-        posts = list(map(dict, posts))
-        posts = list(map(format_datetime, posts))
-        return posts, 200
-
-async def forum_users(app, slug, limit, since, desc):
-    query = "select nickname, fullname, email, about from forum_users where forum = $1 "
-    counter = 2
+def thread_posts_query(ident, limit, since, sort, desc, cursor):
+    seek = None
     fields = []
-    if since:
-        since = since.lower()
-        if desc == 'true':
-            query += "and lower(nickname) < ${:d} ".format(counter)
-        else:
-            query += "and lower(nickname) > ${:d} ".format(counter)
-        counter += 1
+    if cursor:
+        fields.extend(cursors.decode(cursor, sort, desc))
+        seek = 'cursor'
+    elif since:
         fields.append(since)
-    query += "order by lower(nickname) "
-    if desc == 'true':
-        query += "desc "
-    query += "limit ${:d};".format(counter)
+        seek = 'since'
     fields.append(limit)
+    return ('thread_posts', ident['name'], sort, desc, seek), fields
+
+async def thread_posts(app, ident, limit, since, sort, desc, cursor = None):
+    ident = cache.resolve(app, ident)
+    sort = sort if sort in SORTS else 'flat'
+    desc = flag(desc)
+    try:
+        query, fields = thread_posts_query(ident, limit, since, sort, desc, cursor)
+    except ValueError as e:
+        error = {'message': str(e)}
+        return error, 400, None
+
+    async with db.reader(app).acquire() as conn:
+        posts = await conn.statements[query].fetch(ident['value'], *fields)
+    if len(posts) == 0:
+        error = {'message': 'thread not found'}
+        return error, 404, None
+    posts = page(posts)
+    if ident['name'] == 'slug' and len(posts) > 0:
+        cache.remember_slug(app, ident['value'], posts[0]['thread'], posts[0]['forum'])
+
+    next_cursor = None
+    if len(posts) > 0 and cursors.page_size(sort, posts) >= limit:
+        next_cursor = cursors.encode(sort, desc, cursors.next_key(sort, posts[-1]))
+    if sort != 'flat':
+        posts = list(map(without_path, posts))
+    return posts, 200, next_cursor
+
+def forum_users_query(limit, since, desc):
+    fields = [since] if since else []
+    fields.append(limit)
+    return ('forum_users', flag(desc), bool(since)), fields
 
-    async with app['db_pool'].acquire() as conn:
-        forum = await conn.fetchrow("select slug from forums where slug = $1;", slug)
-        if forum is None:
-            error = {'message': 'forum not found'}
-            return error, 404
-
-        users = await conn.fetch(query, slug, *fields)
-        return list(map(dict, users)), 200
+async def forum_users(app, slug, limit, since, desc):
+    query, fields = forum_users_query(limit, since, desc)
+    async with db.reader(app).acquire() as conn:
+        users = await conn.statements[query].fetch(slug, *fields)
+    if len(users) == 0:
+        error = {'message': 'forum not found'}
+        return error, 404
+    return page(users), 200
+
+def without_path(post):
+    return {key: value for key, value in post.items() if key != 'path'}
+
+async def stream_rows(app, parent, query, fields, convert = None):
+    value, message = parent
+    async with db.reader(app).acquire() as conn:
+        async with conn.transaction(readonly = True):
+            prefetch = app['config'].get('stream', {}).get('prefetch', 100)
+            found = False
+            async for record in conn.statements[query].cursor(value, *fields, prefetch = prefetch):
+                if not found:
+                    found = True
+                    yield None, 200
+                    if record[0] is None:
+                        return
+                yield convert(record) if convert else record
+
+            if not found:
+                error = {'message': message}
+                yield error, 404
+
+async def stream_error(error, status):
+    yield error, status
+
+def stream_forum_threads(app, slug, limit, since, desc):
+    query, fields = forum_threads_query(limit, since, desc)
+    return stream_rows(app, (slug, 'forum not found'), query, fields)
+
+def stream_thread_posts(app, ident, limit, since, sort, desc, cursor = None):
+    ident = cache.resolve(app, ident)
+    sort = sort if sort in SORTS else 'flat'
+    desc = flag(desc)
+    try:
+        query, fields = thread_posts_query(ident, limit, since, sort, desc, cursor)
+    except ValueError as e:
+        error = {'message': str(e)}
+        return stream_error(error, 400)
+
+    parent = (ident['value'], 'thread not found')
+    return stream_rows(app, parent, query, fields, without_path if sort != 'flat' else None)
+
+def stream_forum_users(app, slug, limit, since, desc):
+    query, fields = forum_users_query(limit, since, desc)
+    return stream_rows(app, (slug, 'forum not found'), query, fields)
 
 async def update_post(app, id, form):
-    post, status = await get_post(app, id, [])
+    post, status = await get_post(app, id, [], app['db_pool'])
     if status != 200:
         return post, status
     post = post['post']
@@ -397,33 +369,35 @@ async def update_post(app, id, form):
             error = {'message': 'thread cannot be updated'}
             return error, 409
 
-async def get_post(app, id, related):
-    data = {}
-    async with app['db_pool'].acquire() as conn:
-        post = await conn.fetchrow("select id, parent, author, forum, thread, message, created, edit from posts where id = $1;", id)
-        if post is None:
+def split_related(row, alias):
+    prefix = alias + '_'
+    return {key[len(prefix):]: value for key, value in row.items() if key.startswith(prefix)}
+
+async def get_post(app, id, related, pool = None):
+    related = tuple(name for name in RELATED if name in related)
+    pool = pool or db.reader(app)
+    versions = {name: entries.version() for name, entries in app['cache'].items()}
+    async with pool.acquire() as conn:
+        row = await conn.statements[('post', related)].fetchrow(id)
+        if row is None:
             error = {'message': 'post not found'}
             return error, 404
 
-        post = dict(post)
-        format_datetime(post)
-        post['isEdited'] = post.pop('edit')
-        data['post'] = post
-
-    if 'forum' in related:
-        forum, status = await get_forum(app, data['post']['forum'])
-        if status != 200:
-            return forum, status
-        data['forum'] = forum
-    if 'thread' in related:
-        thread, status = await get_thread(app, {'name': 'id', 'value': data['post']['thread']})
-        if status != 200:
-            return thread, status
-        data['thread'] = thread
-    if 'user' in related:
-        author, status = await get_profile(app, data['post']['author'])
-        if status != 200:
-            return author, status
-        data['author'] = author
-    
+    data = {}
+    data['post'] = split_related(row, 'p')
+    for name, alias, key in (('forum', 'f', 'forum'), ('thread', 't', 'thread'), ('user', 'u', 'author')):
+        if name in related:
+            data[key] = split_related(row, alias)
+
+    if pool is app['db_pool']:
+        if 'forum' in data:
+            app['cache']['forums'].set(cache.forum_key(data['forum']['slug']), data['forum'], versions['forums'])
+        if 'thread' in data:
+            cache.put_thread(app, data['thread'], versions['threads'])
+        if 'author' in data:
+            app['cache']['users'].set(cache.user_key(data['author']['nickname']), data['author'], versions['users'])
+
     return data, 200
+
+async def cache_stats(app):
+    return cache.stats(app), 200
@@ -0,0 +1,74 @@
+import asyncio
+
+from asyncpg.exceptions import ForeignKeyViolationError
+
+from . import cache, usecases
+
+class VoteBatcher:
+    def __init__(self, app):
+        self.app = app
+        self.pending = {}
+
+    def submit(self, ident, nickname, voice):
+        key = cache.thread_key(ident['name'], ident['value'])
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = {'ident': ident, 'votes': {}, 'waiters': []}
+            asyncio.get_running_loop().call_soon(self.flush, key)
+
+        future = asyncio.get_running_loop().create_future()
+        batch['votes'][nickname.lower()] = (nickname, voice)
+        batch['waiters'].append((future, ident, nickname, voice))
+        return future
+
+    def flush(self, key):
+        batch = self.pending.pop(key)
+        asyncio.ensure_future(self.run(batch))
+
+    async def run(self, batch):
+        try:
+            result = await self.execute(batch)
+        except ForeignKeyViolationError:
+            result = None
+        except Exception as e:
+            for future, *_ in batch['waiters']:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, ident, nickname, voice in batch['waiters']:
+            if future.done():
+                continue
+            if result is None:
+                asyncio.ensure_future(self.resolve(future, usecases.cast_vote(self.app, ident, nickname, voice)))
+            else:
+                future.set_result(result)
+
+    async def resolve(self, future, coro):
+        try:
+            result = await coro
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def execute(self, batch):
+        ident = batch['ident']
+        authors = [author for author, _ in batch['votes'].values()]
+        values = [value for _, value in batch['votes'].values()]
+        async with self.app['db_pool'].acquire() as conn:
+            thread = await conn.statements[('vote_batch', ident['name'])].fetchrow(ident['value'], authors, values)
+
+        if thread is None:
+            error = {'message': 'thread not found'}
+            return error, 404
+
+        thread = dict(thread)
+        cache.thread_changed(self.app, thread)
+        return thread, 200
+
+async def init_votes(app):
+    if app['config'].get('votes', {}).get('batching'):
+        app['votes'] = VoteBatcher(app)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import traceback
+
+from aiohttp import web
+
+from . import metrics, server
+
+MIN_UPTIME = 10
+MAX_BACKOFF = 30
+
+def make_socket(port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def spawn(create_app, sock, options):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        status = 0
+        try:
+            web.run_app(create_app(), sock = sock, print = None, **options)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        os._exit(status)
+    return pid
+
+def serve(create_app, config):
+    count = config.get('workers', {}).get('count', 1)
+    port = config['app']['port']
+    loop = server.install_loop(config)
+    options = server.run_options(config)
+    print("======== Using {:s} event loop ========".format(loop))
+    if count <= 1:
+        web.run_app(create_app(), port = port, **options)
+        return
+
+    sock = make_socket(port, options['backlog'])
+    directory = tempfile.mkdtemp(prefix = 'forums-metrics-')
+    config.setdefault('metrics', {})['directory'] = directory
+    children = {}
+    stopping = False
+    delay = 0
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(count):
+        children[spawn(create_app, sock, options)] = time.monotonic()
+    print("======== Running {:d} workers on http://0.0.0.0:{:d} ========".format(count, port))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        metrics.snapshot_path(directory, pid).unlink(missing_ok = True)
+        if stopping:
+            continue
+
+        if started is not None and time.monotonic() - started < MIN_UPTIME:
+            delay = min(max(delay * 2, 0.5), MAX_BACKOFF)
+        else:
+            delay = 0
+        print("worker {:d} exited with status {:d}, restarting in {:.1f}s".format(pid, os.waitstatus_to_exitcode(status), delay))
+        time.sleep(delay)
+        if not stopping:
+            children[spawn(create_app, sock, options)] = time.monotonic()
+    sock.close()
+    shutil.rmtree(directory, ignore_errors = True)
\ No newline at end of file